@@ -3,17 +3,16 @@
 import argparse
 import os
 import logging
-from relay_client import RelayClient
-from persistence import PersistenceManager
-from sync_engine import SyncEngine
-from webhook_handler import WebhookProcessor
-from operations_queue import OperationsQueue
-from web_server import create_server
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 logger = logging.getLogger(__name__)
 
+# Upper bound on relays synced concurrently during startup
+STARTUP_SYNC_MAX_WORKERS = 16
+
+# Seconds to wait for queued sync requests to finish when the server stops
+SHUTDOWN_QUEUE_TIMEOUT = 30.0
+
 
 def startup_sync_all_folders(sync_engine, persistence_manager):
     """Run initial sync for all configured folders on startup"""
@@ -34,30 +33,39 @@ def startup_sync_all_folders(sync_engine, persistence_manager):
         total_synced = 0
         total_failed = 0
 
-        for relay_id in relays_to_sync:
-            try:
-                print(f"Syncing relay: {relay_id}")
-
-                # Run sync for all folders in this relay
-                results = sync_engine.sync_relay_all_folders(relay_id)
-
-                # Count results
+        # Relay syncs are dominated by network and git I/O, so run them concurrently
+        max_workers = min(STARTUP_SYNC_MAX_WORKERS, len(relays_to_sync))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for relay_id in relays_to_sync:
+                futures[executor.submit(sync_engine.sync_relay_all_folders, relay_id)] = relay_id
+
+            for future in as_completed(futures):
+                relay_id = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.warning(f"Error syncing relay {relay_id} during startup: {e}")
+                    total_failed += 1
+                    continue
+
+                # Buffer per-folder status lines and emit them in one write per relay
+                lines = [f"Syncing relay: {relay_id}"]
                 for result in results:
                     if result.success:
                         total_synced += 1
                         if result.operations:
-                            print(
+                            lines.append(
                                 f"  ✓ Synced folder {result.folder_id} ({len(result.operations)} operations)"
                             )
                         else:
-                            print(f"  ✓ Folder {result.folder_id} up to date")
+                            lines.append(f"  ✓ Folder {result.folder_id} up to date")
                     else:
                         total_failed += 1
-                        print(f"  ✗ Failed to sync folder {result.folder_id}: {result.error}")
-
-            except Exception as e:
-                logger.warning(f"Error syncing relay {relay_id} during startup: {e}")
-                total_failed += 1
+                        lines.append(
+                            f"  ✗ Failed to sync folder {result.folder_id}: {result.error}"
+                        )
+                print("\n".join(lines))
 
         # Commit any changes from startup sync
         print("Committing startup sync changes...")
@@ -87,6 +95,17 @@ def run_server(
     print(f"Data directory: {data_dir}")
     print(f"Git commit interval set to {commit_interval} seconds")
 
+    # Import server components lazily so --help and validation failures exit without
+    # paying for Starlette, GitPython and the Y-Sweet client
+    from relay_client import RelayClient
+    from persistence import PersistenceManager
+    from sync_engine import SyncEngine
+    from webhook_handler import WebhookProcessor
+    from operations_queue import OperationsQueue
+    from web_server import create_server
+
+    persistence_manager = None
+    operations_queue = None
     try:
         # Initialize components
         relay_client = RelayClient(relay_server_url, relay_server_api_key)
@@ -101,18 +120,25 @@ def run_server(
         # Run startup sync for all configured git connectors
         startup_sync_all_folders(sync_engine, persistence_manager)
 
-        # Start the server
-        web_server.run(port=port)
+        # Start the server unless a shutdown signal arrived during startup sync
+        if not persistence_manager.shutdown_requested:
+            web_server.run(port=port)
 
     except KeyboardInterrupt:
         print("\nServer shutting down...")
-        # Graceful shutdown would be handled by WebServer
     except Exception as e:
         logger.error(f"Error starting server: {e}")
         raise
+    finally:
+        # Let queued work and in-flight git operations finish before cleaning lock files
+        if operations_queue is not None:
+            operations_queue.stop(timeout=SHUTDOWN_QUEUE_TIMEOUT)
+        if persistence_manager is not None:
+            persistence_manager.shutdown()
 
 
-if __name__ == "__main__":
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser for the server entry point"""
     parser = argparse.ArgumentParser(description="Relay Git Sync app")
     parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
     parser.add_argument(
@@ -147,6 +173,14 @@ if __name__ == "__main__":
         help="Path to git connectors TOML configuration file (default: <data-dir>/git_connectors.toml)",
     )
 
+    return parser
+
+
+if __name__ == "__main__":
+    # Configure logging only when run as the entrypoint, not on import
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = build_parser()
     args = parser.parse_args()
 
     # Validate required relay server URL
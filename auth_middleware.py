@@ -1,19 +1,58 @@
 #!/usr/bin/env python3
 
+import base64
+import binascii
+import hashlib
+import hmac
+import inspect
 import logging
+import time
 from typing import List, Optional, Callable
 from functools import wraps
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 from starlette.requests import Request
+from starlette.routing import BaseRoute, Match
 from jwt_auth import JWTValidator
-from svix.webhooks import Webhook
+from svix.webhooks import WebhookVerificationError
 
 logger = logging.getLogger(__name__)
 
+# Maximum allowed clock skew for Svix webhook timestamps (matches the Svix SDK)
+SVIX_TIMESTAMP_TOLERANCE_SECONDS = 5 * 60
+
+# Serialized once: the plain 401 is the hot path when clients hammer without credentials
+_AUTH_REQUIRED_BODY = JSONResponse({"error": "Authentication required"}).body
+
+# Slot for each accepted signature header; svix- names take precedence over webhook- ones.
+# ASGI guarantees raw header names are lowercased bytes.
+_SVIX_HEADER_SLOTS = {
+    b"svix-id": 0,
+    b"svix-timestamp": 1,
+    b"svix-signature": 2,
+    b"webhook-id": 3,
+    b"webhook-timestamp": 4,
+    b"webhook-signature": 5,
+}
+
+_BEARER_PREFIX = "Bearer "
+_BEARER_PREFIX_LEN = len(_BEARER_PREFIX)
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    """Return the credential after 'Bearer ' (possibly empty), or None if there isn't one"""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith(_BEARER_PREFIX):
+        return None
+    return auth_header[_BEARER_PREFIX_LEN:]
+
 
 class DefaultRejectMiddleware(BaseHTTPMiddleware):
-    """Middleware to enforce default reject pattern"""
+    """Middleware to enforce default reject pattern at request time
+
+    Apps that register their routes up front should prefer validate_route_auth(),
+    which enforces the same invariant once at startup without a per-request frame.
+    """
 
     async def dispatch(self, request, call_next):
         response = await call_next(request)
@@ -47,6 +86,18 @@ class AuthMiddleware(BaseHTTPMiddleware):
         else:
             self.jwt_validator = None
 
+        # Decode the Svix signing key once instead of on every webhook request
+        self.svix_key = None
+        if self.auth_mode == "svix_hmac":
+            self.svix_key = self._decode_svix_secret(webhook_secret)
+
+    @staticmethod
+    def _decode_svix_secret(webhook_secret: str) -> bytes:
+        """Decode a whsec_ prefixed secret into raw HMAC key bytes"""
+        secret = webhook_secret[len("whsec_") :]
+        # Add padding in case the secret is unpadded base64 (extra padding is ignored)
+        return base64.b64decode(secret + "==")
+
     def _detect_auth_mode(self, webhook_secret):
         """Detect authentication mode based on webhook secret"""
         if not webhook_secret:
@@ -61,6 +112,10 @@ class AuthMiddleware(BaseHTTPMiddleware):
         request.state.user = None
         request.state.auth_error = None
 
+        # @noauth endpoints never look at credentials, so skip body reads and HMAC work
+        if self.auth_mode != "none" and self._is_noauth_endpoint(request):
+            return await call_next(request)
+
         if self.auth_mode == "none":
             # No authentication configured - endpoints must use @noauth
             pass
@@ -92,39 +147,49 @@ class AuthMiddleware(BaseHTTPMiddleware):
 
         return response
 
+    @staticmethod
+    def _is_noauth_endpoint(request: Request) -> bool:
+        """Resolve the endpoint the router will dispatch to and check for @noauth"""
+        router = getattr(request.scope.get("app"), "router", None)
+        if router is None:
+            return False
+
+        for route in router.routes:
+            match, child_scope = route.matches(request.scope)
+            if match == Match.FULL:
+                endpoint = child_scope.get("endpoint", getattr(route, "endpoint", None))
+                return getattr(endpoint, "_no_auth_required", False)
+        return False
+
     async def _validate_svix_signature(self, request: Request):
         """Validate Svix-style HMAC signature"""
         try:
-            # Get required headers - check both svix- and webhook- prefixes
-            svix_id = None
-            svix_timestamp = None
-            svix_signature = None
-
-            for name, value in request.headers.items():
-                lower_name = name.lower()
-                if lower_name in ["svix-id", "webhook-id"]:
-                    svix_id = value
-                elif lower_name in ["svix-timestamp", "webhook-timestamp"]:
-                    svix_timestamp = value
-                elif lower_name in ["svix-signature", "webhook-signature"]:
-                    svix_signature = value
+            # Get required headers - check both svix- and webhook- prefixes in one pass
+            values = [None] * 6
+            for name, value in request.headers.raw:
+                slot = _SVIX_HEADER_SLOTS.get(name)
+                if slot is not None and values[slot] is None:
+                    values[slot] = value.decode("latin-1")
+            svix_id = values[0] or values[3]
+            svix_timestamp = values[1] or values[4]
+            svix_signature = values[2] or values[5]
 
             if svix_id is None or svix_timestamp is None or svix_signature is None:
                 return  # Missing headers - let decorators handle
 
-            # Get request body
-            body = await request.body()
-
-            # Validate using Svix SDK
-            wh = Webhook(self.webhook_secret)
-            wh.verify(
-                body,
-                {
-                    "svix-id": svix_id,
-                    "svix-timestamp": svix_timestamp,
-                    "svix-signature": svix_signature,
-                },
-            )
+            timestamp = self._check_svix_timestamp(svix_timestamp)
+
+            # Feed the body into the HMAC as it arrives instead of buffering it first
+            mac = hmac.new(self.svix_key, f"{svix_id}.{timestamp}.".encode("utf-8"), hashlib.sha256)
+            chunks = []
+            async for chunk in request.stream():
+                mac.update(chunk)
+                chunks.append(chunk)
+
+            # Cache the consumed body so the endpoint can still read it downstream
+            request._body = b"".join(chunks)
+
+            self._match_svix_signature(mac.digest(), svix_signature)
 
             # Create a minimal user object for Svix auth
             request.state.user = {"scope": "webhook", "auth_type": "svix", "svix_id": svix_id}
@@ -133,15 +198,46 @@ class AuthMiddleware(BaseHTTPMiddleware):
             logger.error(f"Svix signature validation error: {e}")
             request.state.auth_error = f"Signature validation failed: {e}"
 
+    @staticmethod
+    def _check_svix_timestamp(svix_timestamp: str) -> int:
+        """Parse a Svix timestamp, raising WebhookVerificationError if outside tolerance"""
+        try:
+            timestamp = int(float(svix_timestamp))
+        except ValueError:
+            raise WebhookVerificationError("Invalid Signature Headers")
+
+        now = time.time()
+        if timestamp < now - SVIX_TIMESTAMP_TOLERANCE_SECONDS:
+            raise WebhookVerificationError("Message timestamp too old")
+        if timestamp > now + SVIX_TIMESTAMP_TOLERANCE_SECONDS:
+            raise WebhookVerificationError("Message timestamp too new")
+
+        return timestamp
+
+    @staticmethod
+    def _match_svix_signature(expected: bytes, svix_signature: str):
+        """Compare a computed digest against the Svix signature header"""
+        # Header may carry several space-separated "v1,<base64>" signatures
+        for versioned_signature in svix_signature.split(" "):
+            version, _, signature = versioned_signature.partition(",")
+            if version != "v1":
+                continue
+            try:
+                signature_bytes = base64.b64decode(signature)
+            except binascii.Error:
+                continue
+            if hmac.compare_digest(expected, signature_bytes):
+                return
+
+        raise WebhookVerificationError("No matching signature found")
+
     async def _validate_shared_secret(self, request: Request):
         """Validate shared secret in Authorization header (exact match)"""
         try:
-            auth_header = request.headers.get("Authorization")
-            if not auth_header or not auth_header.startswith("Bearer "):
+            provided_secret = _bearer_token(request)
+            if provided_secret is None:
                 return  # No token provided - let decorators handle
 
-            provided_secret = auth_header[7:]  # Remove 'Bearer ' prefix
-
             # Exact match comparison
             if provided_secret == self.webhook_secret:
                 request.state.user = {"scope": "webhook", "auth_type": "shared_secret"}
@@ -154,13 +250,9 @@ class AuthMiddleware(BaseHTTPMiddleware):
     async def _extract_jwt_token(self, request: Request):
         """Extract JWT token for API endpoints only (not webhooks)"""
         try:
-            auth_header = request.headers.get("Authorization")
-            if not auth_header or not auth_header.startswith("Bearer "):
-                return  # No token provided - let decorators handle
-
-            token = auth_header[7:]  # Remove 'Bearer ' prefix
+            token = _bearer_token(request)
             if not token:
-                return
+                return  # No token provided - let decorators handle
 
             # Store token and validator for later validation by decorators
             request.state.jwt_token = token
@@ -171,29 +263,30 @@ class AuthMiddleware(BaseHTTPMiddleware):
             request.state.auth_error = f"Token extraction error: {e}"
 
 
+def _is_method(func: Callable) -> bool:
+    """Check whether an endpoint takes (self, request) rather than just (request)"""
+    params = list(inspect.signature(func).parameters)
+    return bool(params) and params[0] in ("self", "cls")
+
+
 def noauth(func: Callable) -> Callable:
     """Decorator to explicitly allow unauthenticated access"""
 
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        # Handle both instance methods (self, request) and standalone functions (request)
-        if len(args) == 2:
-            # Instance method: (self, request)
-            self_arg, request = args
-        elif len(args) == 1:
-            # Standalone function: (request)
-            request = args[0]
-            self_arg = None
-        else:
-            raise ValueError("Expected 1 or 2 positional arguments")
-
-        # Mark request as explicitly allowing no auth
-        request.state.auth_explicitly_disabled = True
+    # Pick the wrapper shape once at decoration time instead of inspecting args per call
+    if _is_method(func):
 
-        # Call function with appropriate arguments
-        if self_arg is not None:
+        @wraps(func)
+        async def wrapper(self_arg, request):
+            # Mark request as explicitly allowing no auth
+            request.state.auth_explicitly_disabled = True
             return await func(self_arg, request)
-        else:
+
+    else:
+
+        @wraps(func)
+        async def wrapper(request):
+            # Mark request as explicitly allowing no auth
+            request.state.auth_explicitly_disabled = True
             return await func(request)
 
     # Mark the function as no-auth required
@@ -215,92 +308,128 @@ def require_auth(
         permissions: Required permissions (e.g., ['sync:read', 'sync:write'])
     """
 
-    def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # Handle both instance methods (self, request) and standalone functions (request)
-            if len(args) == 2:
-                # Instance method: (self, request)
-                self_arg, request = args
-            elif len(args) == 1:
-                # Standalone function: (request)
-                request = args[0]
-                self_arg = None
+    # Precompute claim sets and the JWT branch once at decoration time
+    scope_set = frozenset(scopes) if scopes else None
+    role_set = frozenset(roles) if roles else None
+    permission_set = frozenset(permissions) if permissions else None
+    # JWT tokens are only validated for API endpoints
+    validates_api_jwt = bool(scope_set and "api" in scope_set)
+
+    def authorize(request: Request) -> Optional[Response]:
+        """Return an error response if the request is not authorized, otherwise None"""
+        state = request.state
+
+        # Mark that this endpoint has explicit auth requirements
+        state.auth_explicitly_required = True
+
+        # Read the backing dict once; missing keys on State raise and catch per getattr
+        state_dict = getattr(state, "_state", None)
+        if not isinstance(state_dict, dict):
+            state_dict = vars(state)
+
+        # Validate JWT token if present and this is an API endpoint
+        jwt_token = state_dict.get("jwt_token")
+        jwt_validator = state_dict.get("jwt_validator")
+        user = state_dict.get("user")
+        auth_error = state_dict.get("auth_error")
+
+        # If we have a JWT token but no user, validate it now for API endpoints only
+        if validates_api_jwt and jwt_token and not user and not auth_error and jwt_validator:
+            is_valid, payload, error_msg = jwt_validator.validate_api_token(jwt_token)
+
+            if is_valid:
+                state.user = payload
+                user = payload
             else:
-                raise ValueError("Expected 1 or 2 positional arguments")
-
-            # Mark that this endpoint has explicit auth requirements
-            request.state.auth_explicitly_required = True
-
-            # Validate JWT token if present and this is an API endpoint
-            jwt_token = getattr(request.state, "jwt_token", None)
-            jwt_validator = getattr(request.state, "jwt_validator", None)
-            user = getattr(request.state, "user", None)
-            auth_error = getattr(request.state, "auth_error", None)
-
-            # If we have a JWT token but no user, validate it now for API endpoints only
-            if (
-                jwt_token
-                and not user
-                and not auth_error
-                and jwt_validator
-                and scopes
-                and "api" in scopes
-            ):
-                is_valid, payload, error_msg = jwt_validator.validate_api_token(jwt_token)
-
-                if is_valid:
-                    request.state.user = payload
-                    user = payload
-                else:
-                    auth_error = error_msg
-
-            if not user:
-                error_detail = "Authentication required"
-                if auth_error:
-                    error_detail = f"Authentication failed: {auth_error}"
-                return JSONResponse({"error": error_detail}, status_code=401)
-
-            # Validate scopes
-            if scopes:
-                user_scope = user.get("scope")
-                if not user_scope or user_scope not in scopes:
-                    return JSONResponse(
-                        {"error": f"Insufficient scope. Required: {scopes}, Got: {user_scope}"},
-                        status_code=403,
-                    )
-
-            # Validate roles
-            if roles:
-                user_roles = user.get("roles", [])
-                if not any(role in user_roles for role in roles):
-                    return JSONResponse(
-                        {"error": f"Insufficient roles. Required: {roles}, Got: {user_roles}"},
-                        status_code=403,
-                    )
-
-            # Validate permissions
-            if permissions:
-                user_permissions = user.get("permissions", [])
-                if not any(perm in user_permissions for perm in permissions):
-                    return JSONResponse(
-                        {
-                            "error": f"Insufficient permissions. Required: {permissions}, Got: {user_permissions}"
-                        },
-                        status_code=403,
-                    )
-
-            # Call function with appropriate arguments
-            if self_arg is not None:
+                auth_error = error_msg
+
+        if not user:
+            if auth_error:
+                return JSONResponse(
+                    {"error": f"Authentication failed: {auth_error}"}, status_code=401
+                )
+            return Response(_AUTH_REQUIRED_BODY, status_code=401, media_type="application/json")
+
+        # Validate scopes
+        if scope_set:
+            user_scope = user.get("scope")
+            if not isinstance(user_scope, str) or user_scope not in scope_set:
+                return JSONResponse(
+                    {"error": f"Insufficient scope. Required: {scopes}, Got: {user_scope}"},
+                    status_code=403,
+                )
+
+        # Validate roles
+        if role_set:
+            user_roles = user.get("roles", [])
+            if role_set.isdisjoint(user_roles):
+                return JSONResponse(
+                    {"error": f"Insufficient roles. Required: {roles}, Got: {user_roles}"},
+                    status_code=403,
+                )
+
+        # Validate permissions
+        if permission_set:
+            user_permissions = user.get("permissions", [])
+            if permission_set.isdisjoint(user_permissions):
+                return JSONResponse(
+                    {
+                        "error": f"Insufficient permissions. Required: {permissions}, Got: {user_permissions}"
+                    },
+                    status_code=403,
+                )
+
+        return None
+
+    def decorator(func: Callable) -> Callable:
+        # Pick the wrapper shape once at decoration time instead of inspecting args per call
+        if _is_method(func):
+
+            @wraps(func)
+            async def wrapper(self_arg, request):
+                error_response = authorize(request)
+                if error_response is not None:
+                    return error_response
                 return await func(self_arg, request)
-            else:
+
+        else:
+
+            @wraps(func)
+            async def wrapper(request):
+                error_response = authorize(request)
+                if error_response is not None:
+                    return error_response
                 return await func(request)
 
+        # Mark the function as requiring auth so routes can be validated at startup
+        wrapper._auth_required = True
         return wrapper
 
     return decorator
 
 
+def validate_route_auth(routes: List[BaseRoute]):
+    """
+    Enforce the default reject pattern at route registration time
+
+    Raises:
+        ValueError: If any route endpoint lacks @noauth or an auth decorator
+    """
+    unmarked = []
+    for route in routes:
+        endpoint = getattr(route, "endpoint", None)
+        if not (
+            getattr(endpoint, "_no_auth_required", False)
+            or getattr(endpoint, "_auth_required", False)
+        ):
+            unmarked.append(getattr(route, "path", repr(route)))
+
+    if unmarked:
+        raise ValueError(
+            f"Endpoints require explicit authentication configuration: {', '.join(unmarked)}"
+        )
+
+
 def default_reject_handler(request: Request) -> JSONResponse:
     """Default handler for endpoints without explicit auth decorators"""
     return JSONResponse(
@@ -308,6 +437,15 @@ def default_reject_handler(request: Request) -> JSONResponse:
     )
 
 
+async def default_reject_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+    """Answer requests that match no route (404) or no method (405) with the default reject
+
+    Install for 404 and 405 on apps whose routes were checked by validate_route_auth(), so
+    unrouted requests get the same 401 that DefaultRejectMiddleware would give them.
+    """
+    return default_reject_handler(request)
+
+
 # Convenience decorators for common use cases
 def webhook_auth(func: Callable) -> Callable:
     """Shorthand for webhook endpoint authentication (Svix HMAC or shared secret only, no JWT)"""
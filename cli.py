@@ -1,60 +1,110 @@
 #!/usr/bin/env python3
 
 import argparse
+import base64
+import functools
+import hashlib
+import hmac
+import json
 import os
+import re
 import sys
 import logging
 import secrets
-import base64
-import jwt
-import datetime
-from typing import Optional
-from relay_client import RelayClient
-from persistence import PersistenceManager, SSHKeyManager
-from sync_engine import SyncEngine
-from s3rn import S3RemoteFolder
-from git_config import GitConnectorConfig, GitConnector
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+import time
+from dataclasses import asdict
+
+# git_config, relay_client, persistence, sync_engine and s3rn are imported inside
+# the handlers that use them so --help and keygen commands start quickly
+
 logger = logging.getLogger(__name__)
 
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Default size of the fetch pool used by `sync` across a relay's folders
+DEFAULT_SYNC_JOBS = 8
+
+# Separator lines around generated secrets/keys and connector listings
+BANNER = "=" * 50
+WIDE_BANNER = "=" * 80
+
+
+def b64url_encode(data):
+    """Base64url-encode bytes without padding, as used in JWT segments"""
+    # Unpadded length is known up front, so slice instead of scanning for "="
+    return base64.urlsafe_b64encode(data)[: (len(data) * 4 + 2) // 3]
+
+
+# Encoded JOSE header of every token we issue (same compact, sorted form PyJWT emits)
+JWT_HS256_HEADER = b64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+
+
+# Canonical 8-4-4-4-12 hex UUID; uuid.UUID would also accept braces, urn: prefixes and bare hex
+UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I)
+
+
+def is_uuid(value):
+    """Check that value is a UUID in canonical 8-4-4-4-12 hex form"""
+    return isinstance(value, str) and UUID_RE.fullmatch(value) is not None
+
+
+def status_marks():
+    """Return (ok, fail) markers, falling back to ASCII when stdout isn't UTF encoded"""
+    encoding = (getattr(sys.stdout, "encoding", None) or "").lower()
+    if encoding.startswith("utf"):
+        return "✓", "✗"
+    return "[ok]", "[fail]"
+
+
+def print_json(data):
+    """Write a single JSON document to stdout for --json callers"""
+    sys.stdout.write(json.dumps(data) + "\n")
+
 
 def generate_webhook_secret():
     """Generate a secure webhook shared secret (not JWT-based)"""
-    secret_bytes = secrets.token_bytes(32)
-    secret_key = base64.urlsafe_b64encode(secret_bytes).decode("utf-8").rstrip("=")
-    return secret_key  # No prefix - just plain shared secret
+    return secrets.token_urlsafe(32)  # No prefix - just plain shared secret
 
 
 def generate_jwt_secret():
     """Generate a secure JWT signing secret"""
-    secret_bytes = secrets.token_bytes(32)
-    secret_key = base64.urlsafe_b64encode(secret_bytes).decode("utf-8").rstrip("=")
-    return f"sk_{secret_key}"
+    return f"sk_{secrets.token_urlsafe(32)}"
 
 
 def create_jwt_token(secret, scope, expires_in_days=30, name=None):
-    """Create a JWT token with specified scope"""
-    now = datetime.datetime.utcnow()
-    exp = now + datetime.timedelta(days=expires_in_days)
+    """Create an HS256 JWT token with specified scope"""
+    # Integer epoch seconds: one clock read and no datetime conversion
+    now = int(time.time())
+    exp = now + expires_in_days * SECONDS_PER_DAY
 
     payload = {"iat": now, "exp": exp, "scope": scope, "aud": f"{scope}-endpoint"}
 
     if name:
         payload["name"] = name
 
-    # Use the secret directly (remove prefix if present)
-    signing_secret = secret
-    if secret.startswith("sk_"):
-        signing_secret = secret[3:]
+    # We only ever sign HS256, so encode directly rather than going through PyJWT
+    payload_json = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    signing_input = JWT_HS256_HEADER + b"." + b64url_encode(payload_json)
+    signature = hmac.new(get_signing_key(secret), signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + b64url_encode(signature)).decode("ascii")
+
 
-    token = jwt.encode(payload, signing_secret, algorithm="HS256")
-    return token
+@functools.lru_cache(maxsize=8)
+def get_signing_key(secret):
+    """Derive the HS256 key bytes once per distinct secret (remove prefix if present)"""
+    signing_secret = secret[3:] if secret.startswith("sk_") else secret
+    return signing_secret.encode("utf-8")
 
 
 def sync_command(args):
     """Handle sync command"""
+    from relay_client import RelayClient
+    from persistence import PersistenceManager
+    from sync_engine import SyncEngine
+    from s3rn import S3RemoteFolder
+    from concurrent.futures import ThreadPoolExecutor
+
+    persistence_manager = None
     try:
         # Initialize components
         relay_client = RelayClient(args.relay_server_url, args.relay_server_api_key)
@@ -70,13 +120,14 @@ def sync_command(args):
             folder_resource = S3RemoteFolder(args.relay_id, args.folder_id)
             print(f"Syncing specific folder: {args.folder_id}")
             result = sync_engine.sync_specific_folder(folder_resource)
+            total_operations = len(result.operations) if result.success else 0
 
             if result.success:
                 print(f"Successfully synced folder {args.folder_id}")
                 if result.operations:
-                    print(f"Performed {len(result.operations)} operations:")
-                    for op in result.operations:
-                        print(f"  - {op.type.value}: {op.path}")
+                    lines = [f"Performed {len(result.operations)} operations:"]
+                    lines.extend(f"  - {op.type.value}: {op.path}" for op in result.operations)
+                    sys.stdout.write("\n".join(lines) + "\n")
                 else:
                     print("No changes detected")
             else:
@@ -86,29 +137,45 @@ def sync_command(args):
         else:
             # Sync all folders
             print("Syncing all folders in relay")
-            results = sync_engine.sync_relay_all_folders(args.relay_id)
+            with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+                results = sync_engine.sync_relay_all_folders(args.relay_id, executor=executor)
 
             total_operations = 0
             failed_syncs = 0
 
+            # Collect the report and write it in one go rather than a print per line
+            ok_mark, fail_mark = status_marks()
+            lines = []
             for result in results:
                 if result.success:
-                    print(f"✓ Synced folder {result.folder_id}")
+                    lines.append(f"{ok_mark} Synced folder {result.folder_id}")
                     if result.operations:
                         operation_count = len(result.operations)
                         total_operations += operation_count
-                        print(f"  {operation_count} operations performed")
+                        lines.append(f"  {operation_count} operations performed")
                 else:
-                    print(f"✗ Failed to sync folder {result.folder_id}: {result.error}")
+                    lines.append(
+                        f"{fail_mark} Failed to sync folder {result.folder_id}: {result.error}"
+                    )
                     failed_syncs += 1
 
-            print(f"\nSync complete:")
-            print(f"  Total operations: {total_operations}")
-            print(f"  Failed folder syncs: {failed_syncs}")
+            lines.append("\nSync complete:")
+            lines.append(f"  Total operations: {total_operations}")
+            lines.append(f"  Failed folder syncs: {failed_syncs}")
+            sys.stdout.write("\n".join(lines) + "\n")
 
             if failed_syncs > 0:
                 return 1
 
+        if persistence_manager.shutdown_requested:
+            print("Interrupted, not committing changes")
+            return 1
+
+        # Nothing was written, so skip the git status/commit subprocesses entirely
+        if total_operations == 0:
+            print("No changes to commit")
+            return 0
+
         # Commit any changes
         print("Committing changes to git...")
         committed = persistence_manager.commit_changes()
@@ -122,25 +189,68 @@ def sync_command(args):
     except Exception as e:
         logger.error(f"Error during sync: {e}")
         return 1
+    finally:
+        if persistence_manager is not None:
+            persistence_manager.shutdown()
+
+
+def pubkey_cache_path(private_key):
+    """Location of the cached public key derived from private_key"""
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    key_hash = hashlib.sha256(private_key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, "relay-git-sync", f"pubkey_{key_hash}")
+
+
+def load_public_key():
+    """Derive the public key for SSH_PRIVATE_KEY, reusing a cached copy when present"""
+    private_key = os.environ.get("SSH_PRIVATE_KEY")
+    cache_path = pubkey_cache_path(private_key) if private_key else None
+
+    if cache_path:
+        try:
+            with open(cache_path) as f:
+                pubkey = f.read().strip()
+            if pubkey:
+                return pubkey
+        except OSError:
+            pass
+
+    # Create a temporary SSH key manager to extract the public key
+    import tempfile
+    from persistence import SSHKeyManager
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pubkey = SSHKeyManager(temp_dir).get_public_key()
+
+    # Caching is best effort; a read-only home must not break the command
+    try:
+        os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+        fd = os.open(cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(pubkey + "\n")
+    except OSError as e:
+        logger.debug(f"Could not cache public key: {e}")
+
+    return pubkey
 
 
 def show_pubkey_command(args):
     """Handle show-pubkey command"""
     try:
-        # Create a temporary SSH key manager to extract the public key
-        import tempfile
-        import os
-
-        with tempfile.TemporaryDirectory() as temp_dir:
-            ssh_key_manager = SSHKeyManager(temp_dir)
-            pubkey = ssh_key_manager.get_public_key()
-            print("\nSSH Public Key (extracted from SSH_PRIVATE_KEY):")
-            print("=" * 50)
-            print(pubkey)
-            print("=" * 50)
-            print("\nAdd this key to your Git hosting service as a deploy key.")
+        pubkey = load_public_key()
+        if args.json:
+            print_json({"ok": True, "public_key": pubkey})
+            return 0
+        print("\nSSH Public Key (extracted from SSH_PRIVATE_KEY):")
+        print(BANNER)
+        print(pubkey)
+        print(BANNER)
+        print("\nAdd this key to your Git hosting service as a deploy key.")
         return 0
     except ValueError as e:
+        if args.json:
+            print_json({"ok": False, "error": str(e)})
+            return 1
         print(f"Error: {e}")
         print("Set SSH_PRIVATE_KEY environment variable with your private key.")
         return 1
@@ -154,10 +264,13 @@ def webhook_keygen_command(args):
     try:
         # Generate shared secret (default behavior)
         secret = generate_webhook_secret()
+        if args.json:
+            print_json({"ok": True, "secret": secret})
+            return 0
         print("\nGenerated webhook shared secret:")
-        print("=" * 50)
+        print(BANNER)
         print(secret)
-        print("=" * 50)
+        print(BANNER)
         print("\nEnvironment variable:")
         print(f"export WEBHOOK_SECRET={secret}")
         return 0
@@ -170,10 +283,13 @@ def api_keygen_command(args):
     """Handle api keygen command"""
     try:
         secret = generate_jwt_secret()
+        if args.json:
+            print_json({"ok": True, "secret": secret})
+            return 0
         print("\nGenerated API JWT signing secret:")
-        print("=" * 50)
+        print(BANNER)
         print(secret)
-        print("=" * 50)
+        print(BANNER)
         print("\nAdd to your environment:")
         print(f"export JWT_SECRET='{secret}'")
         return 0
@@ -187,6 +303,10 @@ def api_token_create_command(args):
     try:
         jwt_secret = os.getenv("JWT_SECRET")
 
+        if args.json and not (jwt_secret or "").startswith("sk_"):
+            print_json({"ok": False, "error": "JWT_SECRET must be set with an 'sk_' prefix"})
+            return 1
+
         if not jwt_secret:
             print("Error: JWT_SECRET environment variable is required to create API tokens.")
             print("Run: python cli.py api keygen")
@@ -198,10 +318,13 @@ def api_token_create_command(args):
             return 1
 
         token = create_jwt_token(jwt_secret, "api", args.expires, args.name)
+        if args.json:
+            print_json({"ok": True, "token": token, "expires_in_days": args.expires})
+            return 0
         print(f"\nAPI JWT Token (expires in {args.expires} days):")
-        print("=" * 50)
+        print(BANNER)
         print(token)
-        print("=" * 50)
+        print(BANNER)
         print("\nUse with API calls:")
         print(f"Authorization: Bearer {token}")
         return 0
@@ -210,30 +333,41 @@ def api_token_create_command(args):
         return 1
 
 
+def git_config_path(args):
+    """Resolve the git connectors TOML path from --git-config-file or the data dir"""
+    return args.git_config_file or os.path.join(args.data_dir, "git_connectors.toml")
+
+
 def git_connector_list_command(args):
     """Handle git connector list command"""
+    from git_config import GitConnectorConfig
+
     try:
-        config_file = args.git_config_file or os.path.join(args.data_dir, "git_connectors.toml")
-        git_config = GitConnectorConfig(config_file)
+        git_config = GitConnectorConfig(git_config_path(args))
+
+        if args.json:
+            print_json({"ok": True, "connectors": [asdict(c) for c in git_config.connectors]})
+            return 0
 
         if not git_config.connectors:
             print("No git connectors configured.")
             print(f"Create configuration file: {git_config.get_config_file_path()}")
             return 0
 
-        print(f"Git Connectors ({len(git_config.connectors)} configured):")
-        print("=" * 80)
+        lines = [f"Git Connectors ({len(git_config.connectors)} configured):", WIDE_BANNER]
 
         for i, connector in enumerate(git_config.connectors, 1):
-            print(f"{i}. Relay: {connector.relay_id}")
-            print(f"   Folder: {connector.shared_folder_id}")
-            print(f"   URL: {connector.url}")
-            print(f"   Branch: {connector.branch}")
-            print(f"   Remote: {connector.remote_name}")
-            print(f"   Prefix: {connector.prefix or '(root)'}")
+            lines.append(f"{i}. Relay: {connector.relay_id}")
+            lines.append(f"   Folder: {connector.shared_folder_id}")
+            lines.append(f"   URL: {connector.url}")
+            lines.append(f"   Branch: {connector.branch}")
+            lines.append(f"   Remote: {connector.remote_name}")
+            lines.append(f"   Prefix: {connector.prefix or '(root)'}")
             if i < len(git_config.connectors):
-                print()
+                lines.append("")
 
+        # One write for the whole listing rather than a flush per line
+        sys.stdout.write("\n".join(lines) + "\n")
         return 0
     except Exception as e:
         logger.error(f"Error listing git connectors: {e}")
@@ -242,8 +376,10 @@ def git_connector_list_command(args):
 
 def git_connector_add_command(args):
     """Handle git connector add command"""
+    from git_config import GitConnectorConfig, GitConnector
+
     try:
-        config_file = args.git_config_file or os.path.join(args.data_dir, "git_connectors.toml")
+        config_file = git_config_path(args)
         git_config = GitConnectorConfig(config_file)
 
         # Create new connector
@@ -278,8 +414,10 @@ def git_connector_add_command(args):
 
 def git_connector_remove_command(args):
     """Handle git connector remove command"""
+    from git_config import GitConnectorConfig
+
     try:
-        config_file = args.git_config_file or os.path.join(args.data_dir, "git_connectors.toml")
+        config_file = git_config_path(args)
         git_config = GitConnectorConfig(config_file)
 
         removed = git_config.remove_connector(args.relay_id, args.folder_id)
@@ -305,9 +443,10 @@ def git_connector_remove_command(args):
 
 def git_connector_init_command(args):
     """Handle git connector init command"""
+    from git_config import GitConnectorConfig
+
     try:
-        config_file = args.git_config_file or os.path.join(args.data_dir, "git_connectors.toml")
-        git_config = GitConnectorConfig(config_file)
+        git_config = GitConnectorConfig(git_config_path(args))
 
         created = git_config.create_example_config()
 
@@ -329,19 +468,25 @@ def git_connector_init_command(args):
 
 def git_connector_validate_command(args):
     """Handle git connector validate command"""
+    from git_config import GitConnectorConfig
+
     try:
-        config_file = args.git_config_file or os.path.join(args.data_dir, "git_connectors.toml")
-        git_config = GitConnectorConfig(config_file)
+        git_config = GitConnectorConfig(git_config_path(args))
 
         errors = git_config.validate_config()
+        if args.json:
+            print_json({"ok": not errors, "errors": errors})
+            return 1 if errors else 0
+
+        ok_mark, fail_mark = status_marks()
 
         if not errors:
-            print("✓ Git connector configuration is valid")
+            print(f"{ok_mark} Git connector configuration is valid")
             print(f"  File: {git_config.get_config_file_path()}")
             print(f"  Connectors: {len(git_config.connectors)}")
             return 0
         else:
-            print("✗ Git connector configuration has errors:")
+            print(f"{fail_mark} Git connector configuration has errors:")
             for error in errors:
                 print(f"  - {error}")
             return 1
@@ -353,9 +498,15 @@ def git_connector_validate_command(args):
 
 def git_connector_sync_command(args):
     """Handle git connector sync command - create repos from TOML config"""
+    from git_config import GitConnectorConfig
+    from persistence import PersistenceManager
+
+    persistence_manager = None
     try:
-        config_file = args.git_config_file or os.path.join(args.data_dir, "git_connectors.toml")
-        persistence_manager = PersistenceManager(args.data_dir, config_file)
+        config_file = git_config_path(args)
+        persistence_manager = PersistenceManager(
+            args.data_dir, config_file, git_config=GitConnectorConfig(config_file)
+        )
 
         print("Creating git repositories from TOML configuration...")
         print(f"Config file: {config_file}")
@@ -364,7 +515,7 @@ def git_connector_sync_command(args):
         initialized_count = persistence_manager._initialize_git_repos_from_toml()
 
         if initialized_count > 0:
-            print(f"✓ Created {initialized_count} git repositories")
+            print(f"{status_marks()[0]} Created {initialized_count} git repositories")
 
             # Show what was created
             for connector in persistence_manager.git_config.connectors:
@@ -383,85 +534,73 @@ def git_connector_sync_command(args):
     except Exception as e:
         logger.error(f"Error syncing git connectors: {e}")
         return 1
+    finally:
+        if persistence_manager is not None:
+            persistence_manager.shutdown()
 
 
-def main():
-    """Main CLI entry point"""
-    parser = argparse.ArgumentParser(
-        description="Relay Git Sync CLI - Sync collaborative documents to Git remotes",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Examples:
-  # Sync specific folder (folder-id is just the folder UUID)
-  python cli.py sync --relay-id abc123... --folder-id def456...
-
-  # Git connector management
-  python cli.py git init
-  python cli.py git list
-  python cli.py git add --relay-id abc123... --folder-id def456... --url https://github.com/user/repo.git --prefix docs
-  python cli.py git sync  # Create repos from TOML config
-
-  # Webhook authentication (shared secret or Svix HMAC only)
-  python cli.py webhook keygen
-
-  # API authentication (JWT tokens only)
-  python cli.py api keygen
-  python cli.py api token create --name "deploy-script"
+# Argument-free commands dispatched directly from argv, skipping the argparse tree
+FAST_PATH_COMMANDS = {
+    ("webhook", "keygen"): webhook_keygen_command,
+    ("api", "keygen"): api_keygen_command,
+    ("ssh", "show-pubkey"): show_pubkey_command,
+    ("show-pubkey",): show_pubkey_command,
+}
 
-  # SSH key management
-  python cli.py ssh show-pubkey
 
-Authentication Methods:
-  Webhooks: WEBHOOK_SECRET (plain shared secret or whsec_* for Svix)
-  APIs:     JWT_SECRET (sk_* prefix required) + Bearer tokens
+def configure_logging(verbose=False):
+    """Configure root logging for a CLI run"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
 
-Git Connectors:
-  Configure automatic git remote setup via TOML files
-  File: <data-dir>/git_connectors.toml (or --git-config-file)
-        """,
-    )
 
-    # Global arguments
-    parser.add_argument(
-        "--data-dir",
-        default=os.getenv("RELAY_GIT_DATA_DIR", "."),
-        help="Directory for repo and persistent storage (default: from RELAY_GIT_DATA_DIR env var or current directory)",
-    )
-    parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
-    parser.add_argument(
-        "--git-config-file",
-        default=None,
-        help="Path to git connectors TOML configuration file (default: <data-dir>/git_connectors.toml)",
-    )
+def run_command(func, args):
+    """Execute a command handler, mapping interrupts and errors to exit codes"""
+    try:
+        return func(args)
+    except KeyboardInterrupt:
+        print("\nOperation cancelled by user")
+        return 130  # Standard exit code for SIGINT
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return 1
 
-    # Subcommands
-    subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
-    # Sync command
-    sync_parser = subparsers.add_parser("sync", help="Sync relay documents to git")
+def add_sync_arguments(sync_parser, env):
+    """Add arguments for the sync command"""
     sync_parser.add_argument("--relay-id", required=True, help="Relay ID (UUID) to sync")
     sync_parser.add_argument(
         "--relay-server-url",
-        default=os.getenv("RELAY_SERVER_URL"),
+        default=env.get("RELAY_SERVER_URL"),
         help="Relay server URL (default: from RELAY_SERVER_URL env var)",
     )
     sync_parser.add_argument(
         "--relay-server-api-key",
-        default=os.getenv("RELAY_SERVER_API_KEY"),
+        default=env.get("RELAY_SERVER_API_KEY"),
         help="Relay server API key (default: from RELAY_SERVER_API_KEY env var)",
     )
     sync_parser.add_argument(
         "--folder-id",
         help="Specific folder UUID to sync (optional, syncs all folders if not provided)",
     )
+    sync_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_SYNC_JOBS,
+        help=f"Folder documents to fetch concurrently (default: {DEFAULT_SYNC_JOBS})",
+    )
     sync_parser.set_defaults(func=sync_command)
 
-    # Show pubkey command
-    pubkey_parser = subparsers.add_parser("show-pubkey", help="Display SSH public key")
+
+def add_show_pubkey_arguments(pubkey_parser, env):
+    """Add arguments for the show-pubkey command"""
     pubkey_parser.set_defaults(func=show_pubkey_command)
 
-    # Webhook command group
-    webhook_parser = subparsers.add_parser("webhook", help="Webhook management")
+
+def add_webhook_subcommands(webhook_parser, env):
+    """Add the webhook command group"""
+    webhook_parser.set_defaults(help_parser=webhook_parser)
     webhook_subparsers = webhook_parser.add_subparsers(
         dest="webhook_action", help="Webhook actions"
     )
@@ -469,15 +608,19 @@ Git Connectors:
     webhook_keygen_parser = webhook_subparsers.add_parser("keygen", help="Generate webhook secret")
     webhook_keygen_parser.set_defaults(func=webhook_keygen_command)
 
-    # SSH command group
-    ssh_parser = subparsers.add_parser("ssh", help="SSH key management")
+
+def add_ssh_subcommands(ssh_parser, env):
+    """Add the SSH command group"""
+    ssh_parser.set_defaults(help_parser=ssh_parser)
     ssh_subparsers = ssh_parser.add_subparsers(dest="ssh_action", help="SSH actions")
 
     ssh_show_parser = ssh_subparsers.add_parser("show-pubkey", help="Show SSH public key")
     ssh_show_parser.set_defaults(func=show_pubkey_command)
 
-    # Git connector command group
-    git_parser = subparsers.add_parser("git", help="Git connector management")
+
+def add_git_subcommands(git_parser, env):
+    """Add the git connector command group"""
+    git_parser.set_defaults(help_parser=git_parser)
     git_subparsers = git_parser.add_subparsers(dest="git_action", help="Git connector actions")
 
     # git init command
@@ -524,14 +667,17 @@ Git Connectors:
     )
     git_sync_parser.set_defaults(func=git_connector_sync_command)
 
-    # API command group
-    api_parser = subparsers.add_parser("api", help="API management")
+
+def add_api_subcommands(api_parser, env):
+    """Add the API command group"""
+    api_parser.set_defaults(help_parser=api_parser)
     api_subparsers = api_parser.add_subparsers(dest="api_action", help="API actions")
 
     api_keygen_parser = api_subparsers.add_parser("keygen", help="Generate API JWT signing secret")
     api_keygen_parser.set_defaults(func=api_keygen_command)
 
     api_token_parser = api_subparsers.add_parser("token", help="API token management")
+    api_token_parser.set_defaults(help_parser=api_token_parser)
     api_token_subparsers = api_token_parser.add_subparsers(
         dest="api_token_action", help="Token actions"
     )
@@ -543,50 +689,143 @@ Git Connectors:
     api_create_parser.add_argument("--name", help="Token name for identification")
     api_create_parser.set_defaults(func=api_token_create_command)
 
-    # Parse arguments
-    args = parser.parse_args()
 
-    # Configure logging level
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
+# Top-level commands: name -> (help, function adding the command's arguments/subcommands,
+# called with the parser and the environment mapping used for option defaults)
+COMMAND_GROUPS = {
+    "sync": ("Sync relay documents to git", add_sync_arguments),
+    "show-pubkey": ("Display SSH public key", add_show_pubkey_arguments),
+    "webhook": ("Webhook management", add_webhook_subcommands),
+    "ssh": ("SSH key management", add_ssh_subcommands),
+    "git": ("Git connector management", add_git_subcommands),
+    "api": ("API management", add_api_subcommands),
+}
+
+
+# Usage examples shown after the top-level --help
+MAIN_EPILOG = """
+Examples:
+  # Sync specific folder (folder-id is just the folder UUID)
+  python cli.py sync --relay-id abc123... --folder-id def456...
+
+  # Git connector management
+  python cli.py git init
+  python cli.py git list
+  python cli.py git add --relay-id abc123... --folder-id def456... --url https://github.com/user/repo.git --prefix docs
+  python cli.py git sync  # Create repos from TOML config
+
+  # Webhook authentication (shared secret or Svix HMAC only)
+  python cli.py webhook keygen
+
+  # API authentication (JWT tokens only)
+  python cli.py api keygen
+  python cli.py api token create --name "deploy-script"
+
+  # SSH key management
+  python cli.py ssh show-pubkey
+
+Authentication Methods:
+  Webhooks: WEBHOOK_SECRET (plain shared secret or whsec_* for Svix)
+  APIs:     JWT_SECRET (sk_* prefix required) + Bearer tokens
+
+Git Connectors:
+  Configure automatic git remote setup via TOML files
+  File: <data-dir>/git_connectors.toml (or --git-config-file)
+"""
+
+
+def build_parser(commands=None, env=None):
+    """Build the CLI argument parser
+
+    Every command is registered so top-level help and errors list them all, but only
+    the commands named in `commands` (all of them when None) get their arguments and
+    subcommands built. Option defaults come from `env` (os.environ when None).
+    """
+    if env is None:
+        env = os.environ
+
+    parser = argparse.ArgumentParser(
+        description="Relay Git Sync CLI - Sync collaborative documents to Git remotes",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=MAIN_EPILOG,
+    )
+
+    # Global arguments
+    parser.add_argument(
+        "--data-dir",
+        default=env.get("RELAY_GIT_DATA_DIR", "."),
+        help="Directory for repo and persistent storage (default: from RELAY_GIT_DATA_DIR env var or current directory)",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print one JSON object instead of text (keygen, token, pubkey, git list/validate)",
+    )
+    parser.add_argument(
+        "--git-config-file",
+        default=None,
+        help="Path to git connectors TOML configuration file (default: <data-dir>/git_connectors.toml)",
+    )
+
+    # Subcommands
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    for name, (help_text, add_arguments) in COMMAND_GROUPS.items():
+        # Keep descriptions/epilogs verbatim like the top level instead of re-wrapping them
+        command_parser = subparsers.add_parser(
+            name, help=help_text, formatter_class=argparse.RawDescriptionHelpFormatter
+        )
+        if commands is None or name in commands:
+            add_arguments(command_parser, env)
+
+    return parser
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser(commands=None):
+    """Return a parser built once per command set and reused across parses
+
+    Lets long-running drivers call run() repeatedly without rebuilding the parser tree.
+    Environment-derived defaults are captured when each parser is first built.
+    """
+    return build_parser(commands)
+
+
+def run(argv):
+    """Run the CLI for an argument list and return the exit code"""
+    # Exact matches only; anything with flags goes through argparse for validation/help
+    fast_handler = FAST_PATH_COMMANDS.get(tuple(argv))
+    if fast_handler is not None:
+        configure_logging()
+        args = argparse.Namespace(
+            command=argv[0],
+            data_dir=os.getenv("RELAY_GIT_DATA_DIR", "."),
+            verbose=False,
+            git_config_file=None,
+            json=False,
+        )
+        return run_command(fast_handler, args)
+
+    # Only build the subcommand trees for commands that appear on the command line
+    parser = get_parser(frozenset(COMMAND_GROUPS.keys() & set(argv)))
+
+    # Parse arguments
+    args = parser.parse_args(argv)
 
     # Validate command
     if not args.command:
         parser.print_help()
         return 1
 
+    # Configure logging only once we know a command will run
+    configure_logging(args.verbose)
+
     # Check if command has a function handler
     if not hasattr(args, "func"):
-        # This means user didn't specify a subcommand for a command group
-        if args.command == "webhook" and not hasattr(args, "webhook_action"):
-            webhook_parser.print_help()
-            return 1
-        elif args.command == "ssh" and not hasattr(args, "ssh_action"):
-            ssh_parser.print_help()
-            return 1
-        elif args.command == "git" and not hasattr(args, "git_action"):
-            git_parser.print_help()
-            return 1
-        elif args.command == "api" and not hasattr(args, "api_action"):
-            api_parser.print_help()
-            return 1
-        elif (
-            args.command == "webhook"
-            and args.webhook_action == "token"
-            and not hasattr(args, "webhook_token_action")
-        ):
-            webhook_token_parser.print_help()
-            return 1
-        elif (
-            args.command == "api"
-            and args.api_action == "token"
-            and not hasattr(args, "api_token_action")
-        ):
-            api_token_parser.print_help()
-            return 1
-        else:
-            parser.print_help()
-            return 1
+        # This means user didn't specify a subcommand for a command group; each group
+        # sets help_parser, so the deepest group reached wins
+        getattr(args, "help_parser", parser).print_help()
+        return 1
 
     # Validate sync command requirements
     if args.command == "sync":
@@ -596,29 +835,31 @@ Git Connectors:
             )
             return 1
 
-        # Validate relay ID format (basic UUID check)
-        if not args.relay_id or len(args.relay_id.split("-")) != 5:
+        # Validate relay ID format
+        if not args.relay_id or not is_uuid(args.relay_id):
             print(
                 "Error: Invalid relay ID format. Expected UUID format: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
             )
             return 1
 
-        # Validate folder ID format if provided (should be simple UUID)
-        if args.folder_id and len(args.folder_id.split("-")) != 5:
+        if args.jobs < 1:
+            print("Error: --jobs must be at least 1")
+            return 1
+
+        # Validate folder ID format if provided (a single UUID, not a compound ID)
+        if args.folder_id and not is_uuid(args.folder_id):
             print(
                 "Error: Invalid folder ID format. Expected UUID format: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
             )
             return 1
 
     # Execute command
-    try:
-        return args.func(args)
-    except KeyboardInterrupt:
-        print("\nOperation cancelled by user")
-        return 130  # Standard exit code for SIGINT
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return 1
+    return run_command(args.func, args)
+
+
+def main():
+    """Main CLI entry point"""
+    return run(sys.argv[1:])
 
 
 if __name__ == "__main__":
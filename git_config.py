@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
 import os
+import copy
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -17,8 +18,12 @@ except ImportError:
         logger.error("TOML parsing not available. Install tomli for Python < 3.11")
         tomllib = None
 
+# Parsed connectors per absolute config path, tagged with the (mtime_ns, size) they were read at.
+# The cache owns its connectors; instances get copies so their edits never leak into it
+_PARSE_CACHE: Dict[str, Tuple[int, int, Tuple["GitConnector", ...]]] = {}
 
-@dataclass
+
+@dataclass(slots=True)
 class GitConnector:
     """Configuration for a git connector linking a shared folder to a git repository"""
 
@@ -42,10 +47,10 @@ class GitConnector:
         if not self.remote_name:
             raise ValueError("remote_name is required")
 
-        # Validate UUID format (basic check)
-        if len(self.shared_folder_id.split("-")) != 5:
+        # Validate UUID format (basic check: five dash-separated groups)
+        if self.shared_folder_id.count("-") != 4:
             raise ValueError(f"Invalid shared_folder_id format: {self.shared_folder_id}")
-        if len(self.relay_id.split("-")) != 5:
+        if self.relay_id.count("-") != 4:
             raise ValueError(f"Invalid relay_id format: {self.relay_id}")
 
 
@@ -54,9 +59,31 @@ class GitConnectorConfig:
 
     def __init__(self, config_file: Optional[str] = None):
         self.config_file = config_file or "git_connectors.toml"
+        # Resolved once, against the working directory at construction time
+        self._config_abspath = os.path.abspath(self.config_file)
         self.connectors: List[GitConnector] = []
         self._load_config()
 
+    @property
+    def connectors(self) -> List[GitConnector]:
+        """Connectors in file order; assign a new list rather than mutating it in place"""
+        return self._connectors
+
+    @connectors.setter
+    def connectors(self, connectors: List[GitConnector]):
+        """Replace the connector list and rebuild the lookup indexes"""
+        self._connectors = connectors
+        # (relay_id, folder_id) -> first matching connector, as a list scan would find
+        self._index: Dict[Tuple[str, str], GitConnector] = {}
+        by_relay: Dict[str, List[GitConnector]] = {}
+        for connector in connectors:
+            self._index.setdefault((connector.relay_id, connector.shared_folder_id), connector)
+            by_relay.setdefault(connector.relay_id, []).append(connector)
+        # Immutable buckets can be handed out directly without copying
+        self._relay_index: Dict[str, Tuple[GitConnector, ...]] = {
+            relay_id: tuple(bucket) for relay_id, bucket in by_relay.items()
+        }
+
     def _load_config(self):
         """Load git connectors from TOML configuration file"""
         if tomllib is None:
@@ -64,10 +91,20 @@ class GitConnectorConfig:
             return
 
         config_path = Path(self.config_file)
-        if not config_path.exists():
+        try:
+            st = os.stat(config_path)
+        except FileNotFoundError:
             logger.info(f"Git connector config file not found: {config_path}")
             return
 
+        # Skip the parse entirely while the file is unchanged since we last read it
+        cache_key = self._config_abspath
+        cached = _PARSE_CACHE.get(cache_key)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            self.connectors = [copy.copy(connector) for connector in cached[2]]
+            logger.debug(f"Using cached git connector config: {config_path}")
+            return
+
         try:
             with open(config_path, "rb") as f:
                 config_data = tomllib.load(f)
@@ -78,7 +115,7 @@ class GitConnectorConfig:
                 logger.error("git_connector must be an array in TOML config")
                 return
 
-            self.connectors = []
+            connectors = []
             for i, connector_data in enumerate(git_connectors):
                 try:
                     connector = GitConnector(
@@ -89,7 +126,7 @@ class GitConnectorConfig:
                         remote_name=connector_data.get("remote_name", "origin"),
                         prefix=connector_data.get("prefix", ""),
                     )
-                    self.connectors.append(connector)
+                    connectors.append(connector)
                     logger.info(
                         f"Loaded git connector: relay={connector.relay_id}, "
                         f"folder={connector.shared_folder_id}, url={connector.url}"
@@ -99,42 +136,48 @@ class GitConnectorConfig:
                 except ValueError as e:
                     logger.error(f"Invalid git_connector[{i}] configuration: {e}")
 
+            self.connectors = connectors
+            _PARSE_CACHE[cache_key] = (
+                st.st_mtime_ns,
+                st.st_size,
+                tuple(copy.copy(connector) for connector in connectors),
+            )
+
         except Exception as e:
             logger.error(f"Error loading git connector config from {config_path}: {e}")
 
     def get_connector_for_folder(self, relay_id: str, folder_id: str) -> Optional[GitConnector]:
         """Get git connector configuration for a specific folder"""
-        for connector in self.connectors:
-            if connector.relay_id == relay_id and connector.shared_folder_id == folder_id:
-                return connector
-        return None
+        return self._index.get((relay_id, folder_id))
 
-    def get_connectors_for_relay(self, relay_id: str) -> List[GitConnector]:
-        """Get all git connector configurations for a specific relay"""
-        return [c for c in self.connectors if c.relay_id == relay_id]
+    def get_connectors_for_relay(self, relay_id: str) -> Tuple[GitConnector, ...]:
+        """Get all git connector configurations for a specific relay (shared, read-only)"""
+        return self._relay_index.get(relay_id, ())
 
     def add_connector(self, connector: GitConnector):
         """Add a new git connector configuration"""
-        # Remove existing connector with same relay_id/folder_id if it exists
+        key = (connector.relay_id, connector.shared_folder_id)
+        if key not in self._index:
+            self._connectors.append(connector)
+            self._index[key] = connector
+            self._relay_index[connector.relay_id] = self.get_connectors_for_relay(
+                connector.relay_id
+            ) + (connector,)
+            return
+
+        # Remove existing connector with same relay_id/folder_id
         self.connectors = [
-            c
-            for c in self.connectors
-            if not (
-                c.relay_id == connector.relay_id
-                and c.shared_folder_id == connector.shared_folder_id
-            )
-        ]
-        self.connectors.append(connector)
+            c for c in self._connectors if (c.relay_id, c.shared_folder_id) != key
+        ] + [connector]
 
     def remove_connector(self, relay_id: str, folder_id: str) -> bool:
         """Remove a git connector configuration"""
-        original_count = len(self.connectors)
-        self.connectors = [
-            c
-            for c in self.connectors
-            if not (c.relay_id == relay_id and c.shared_folder_id == folder_id)
-        ]
-        return len(self.connectors) < original_count
+        key = (relay_id, folder_id)
+        if key not in self._index:
+            return False
+
+        self.connectors = [c for c in self._connectors if (c.relay_id, c.shared_folder_id) != key]
+        return True
 
     def save_config(self):
         """Save current git connectors to TOML configuration file"""
@@ -200,12 +243,16 @@ class GitConnectorConfig:
         return errors
 
     def reload_config(self):
-        """Reload configuration from file"""
+        """Reload configuration from file (a no-op parse if the file is unchanged)"""
         self._load_config()
 
+    def invalidate(self):
+        """Drop the cached parse so the next reload rereads the file unconditionally"""
+        _PARSE_CACHE.pop(self._config_abspath, None)
+
     def get_config_file_path(self) -> str:
         """Get the full path to the configuration file"""
-        return os.path.abspath(self.config_file)
+        return self._config_abspath
 
     def create_example_config(self):
         """Create an example configuration file"""
@@ -237,6 +284,8 @@ prefix = ""  # Optional: subdirectory within repo (e.g., "docs" or "content/post
         try:
             with open(config_path, "w") as f:
                 f.write(example_content)
+            # A same-size rewrite within the mtime granularity would look unchanged to the cache
+            self.invalidate()
             logger.info(f"Created example git connector config: {config_path}")
             return True
         except Exception as e:
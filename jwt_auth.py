@@ -1,8 +1,24 @@
 #!/usr/bin/env python3
 
+import hashlib
+import time
+from collections import OrderedDict
 import jwt
 from typing import Tuple, Dict, Any, Optional
 
+# Successful validations are reused for at most this many seconds
+TOKEN_CACHE_TTL_SECONDS = 60
+# Upper bound on cached tokens; expired entries go first, then the least recently used
+TOKEN_CACHE_MAX_ENTRIES = 1024
+
+# Only HS256 tokens are issued (see cli.create_jwt_token); a tuple avoids a list per decode
+ALLOWED_ALGORITHMS = ("HS256",)
+API_AUDIENCE = "api-endpoint"
+API_SCOPE = "api"
+
+# Tokens we issue are a few hundred bytes; anything far larger is rejected before hashing/decoding
+MAX_TOKEN_LEN = 8192
+
 
 class JWTValidator:
     """JWT token validation logic extracted from web server"""
@@ -12,6 +28,13 @@ class JWTValidator:
         if signing_secret.startswith("sk_"):
             self.signing_secret = signing_secret[3:]
 
+        # Key bytes and decoder are prepared once instead of on every jwt.decode call
+        self._signing_key = self.signing_secret.encode("utf-8")
+        self._decoder = jwt.PyJWT()
+
+        # Cache of validated tokens keyed by a digest of the token (never the token itself)
+        self._token_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
     def validate_api_token(
         self, token: str
     ) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
@@ -21,14 +44,31 @@ class JWTValidator:
         Returns:
             (is_valid, payload, error_message)
         """
+        # Cheap shape checks so oversized or non-JWT strings never reach the crypto path
+        if len(token) > MAX_TOKEN_LEN or token.count(".") != 2:
+            return False, None, "Invalid token"
+
+        cache_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+        now = time.time()
+
+        cached = self._token_cache.get(cache_key)
+        if cached is not None:
+            expires_at, payload = cached
+            if now < expires_at:
+                self._token_cache.move_to_end(cache_key)
+                return True, dict(payload), None
+            self._token_cache.pop(cache_key, None)
+
         try:
-            payload = jwt.decode(
-                token, self.signing_secret, algorithms=["HS256"], audience="api-endpoint"
+            payload = self._decoder.decode(
+                token, self._signing_key, algorithms=ALLOWED_ALGORITHMS, audience=API_AUDIENCE
             )
 
-            if payload.get("scope") != "api":
+            # scope is not a registered claim, so PyJWT can't check it during decode
+            if payload.get("scope") != API_SCOPE:
                 return False, None, "Invalid token scope for API endpoint"
 
+            self._cache_token(cache_key, payload, now)
             return True, payload, None
 
         except jwt.ExpiredSignatureError:
@@ -37,3 +77,21 @@ class JWTValidator:
             return False, None, "Invalid token"
         except Exception as e:
             return False, None, f"JWT validation error: {e}"
+
+    def _cache_token(self, cache_key: bytes, payload: Dict[str, Any], now: float):
+        """Cache a validated payload until the token expires or the TTL elapses"""
+        expires_at = now + TOKEN_CACHE_TTL_SECONDS
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+
+        # Purge lazily on insert so the cache stays bounded
+        if len(self._token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+            self._token_cache = OrderedDict(
+                (key, entry) for key, entry in self._token_cache.items() if entry[0] > now
+            )
+            # Still full of live tokens: drop the least recently used instead of everything
+            while len(self._token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+                self._token_cache.popitem(last=False)
+
+        self._token_cache[cache_key] = (expires_at, dict(payload))
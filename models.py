@@ -2,6 +2,7 @@
 
 import threading
 import time
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
 from dataclasses import dataclass
@@ -40,6 +41,28 @@ from typing import Literal
 SyncFileType = Literal[SyncType.IMAGE, SyncType.PDF, SyncType.AUDIO, SyncType.VIDEO, SyncType.FILE]
 
 
+# Metadata resource type -> S3RN resource category
+RESOURCE_CATEGORIES: Dict[str, str] = {
+    ResourceType.MARKDOWN.value: "document",
+    ResourceType.DOCUMENT.value: "document",
+    ResourceType.CANVAS.value: "canvas",
+    ResourceType.FILE.value: "file",
+    ResourceType.IMAGE.value: "file",
+    ResourceType.PDF.value: "file",
+    ResourceType.AUDIO.value: "file",
+    ResourceType.VIDEO.value: "file",
+    ResourceType.FOLDER.value: "folder",
+}
+
+
+# S3RN category -> resource class for documents inside a folder
+DOCUMENT_RESOURCE_CLASSES = {
+    "document": S3RemoteDocument,
+    "canvas": S3RemoteCanvas,
+    "file": S3RemoteFile,
+}
+
+
 def get_s3rn_resource_category(resource_type: str) -> str:
     """
     Map resource metadata types to S3RN resource categories.
@@ -50,31 +73,14 @@ def get_s3rn_resource_category(resource_type: str) -> str:
     Returns:
         S3RN resource category: 'document', 'canvas', 'file', or 'folder'
     """
-    if resource_type in [ResourceType.MARKDOWN.value, ResourceType.DOCUMENT.value]:
-        return "document"
-    elif resource_type == ResourceType.CANVAS.value:
-        return "canvas"
-    elif resource_type in [
-        ResourceType.FILE.value,
-        ResourceType.IMAGE.value,
-        ResourceType.PDF.value,
-        ResourceType.AUDIO.value,
-        ResourceType.VIDEO.value,
-    ]:
-        return "file"
-    elif resource_type == ResourceType.FOLDER.value:
-        return "folder"
-    else:
-        # Unknown types default to file
-        return "file"
+    # Unknown types default to file
+    return RESOURCE_CATEGORIES.get(resource_type, "file")
 
 
 def create_document_resource_from_metadata(
     relay_id: str, folder_id: str, metadata: Dict
 ) -> "S3RNType":
     """Create appropriate S3RN resource from document metadata"""
-    from s3rn import S3RemoteDocument, S3RemoteCanvas, S3RemoteFile
-
     # Extract required fields from metadata
     doc_id = metadata.get("id")
     if not doc_id:
@@ -93,17 +99,13 @@ def create_document_resource_from_metadata(
     # Map to S3RN resource category and create appropriate resource
     s3rn_category = get_s3rn_resource_category(resource_type)
 
-    if s3rn_category == "document":
-        return S3RemoteDocument(relay_id, folder_id, doc_id)
-    elif s3rn_category == "canvas":
-        return S3RemoteCanvas(relay_id, folder_id, doc_id)
-    elif s3rn_category == "file":
-        return S3RemoteFile(relay_id, folder_id, doc_id)
-    else:
+    resource_class = DOCUMENT_RESOURCE_CLASSES.get(s3rn_category)
+    if resource_class is None:
         valid_types = [rt.value for rt in ResourceType]
         raise ValueError(
             f"Unknown resource type '{resource_type}' (mapped to category '{s3rn_category}'). Expected one of: {', '.join(valid_types)}"
         )
+    return resource_class(relay_id, folder_id, doc_id)
 
 
 class OperationType(Enum):
@@ -114,7 +116,7 @@ class OperationType(Enum):
     NOOP = "noop"
 
 
-@dataclass
+@dataclass(slots=True)
 class SyncOperation:
     type: OperationType
     path: str
@@ -128,7 +130,7 @@ class SyncOperation:
     error: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class FileMetadata:
     id: str
     path: str
@@ -138,13 +140,13 @@ class FileMetadata:
     modified: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class SyncRequest:
     resource: S3RNType  # Can be folder, document, etc.
     timestamp: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class SyncResult:
     resource: S3RNType
     operations: List[SyncOperation]
@@ -159,13 +161,38 @@ class SyncResult:
         return S3RN.get_folder_id(self.resource)
 
 
+# Most operations SyncState keeps per list; the oldest fall off once the bound is reached
+MAX_TRACKED_OPERATIONS = 10_000
+
+
 class SyncState:
     def __init__(self):
         self.is_syncing = False
         self.sync_requested_during_sync = False
         self.sync_lock = threading.Lock()
-        self.pending_operations: List[SyncOperation] = []
-        self.completed_operations: List[SyncOperation] = []
+        self.pending_operations: "deque[SyncOperation]" = deque(maxlen=MAX_TRACKED_OPERATIONS)
+        self.completed_operations: "deque[SyncOperation]" = deque(maxlen=MAX_TRACKED_OPERATIONS)
         self.has_changes = False
         self.last_git_commit = time.time()
         self.folder_sync_locks = {}  # Per-folder sync locks
+
+    def snapshot_completed_operations(self) -> List[SyncOperation]:
+        """Operations completed so far, taken before a commit so only they are cleared after it"""
+        with self.sync_lock:
+            return list(self.completed_operations)
+
+    def clear_committed_operations(self, committed: List[SyncOperation]):
+        """Forget operations whose results are now in a git commit
+
+        Operations completed after the snapshot was taken are kept for the next commit.
+        """
+        committed_ids = {id(op) for op in committed}
+        with self.sync_lock:
+            self.completed_operations = deque(
+                (op for op in self.completed_operations if id(op) not in committed_ids),
+                maxlen=MAX_TRACKED_OPERATIONS,
+            )
+            self.pending_operations = deque(
+                (op for op in self.pending_operations if id(op) not in committed_ids),
+                maxlen=MAX_TRACKED_OPERATIONS,
+            )
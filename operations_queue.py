@@ -10,16 +10,36 @@ from sync_engine import SyncEngine
 
 logger = logging.getLogger(__name__)
 
+# Default cap on queued requests; producers are refused rather than growing memory unbounded
+DEFAULT_MAX_QUEUE_SIZE = 10000
+
+# Queued by stop() to wake the worker and tell it to exit
+_SHUTDOWN = object()
+
 
 class OperationsQueue:
     """Thread-safe queue for processing sync requests with git commit coordination"""
 
-    def __init__(self, sync_engine: SyncEngine, commit_interval: int = 10):
+    def __init__(
+        self,
+        sync_engine: SyncEngine,
+        commit_interval: int = 10,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+    ):
         self.sync_engine = sync_engine
         self.commit_interval = commit_interval
-        self.request_queue = queue.Queue()
+        self.request_queue = queue.Queue(maxsize=max_queue_size)
         self.sync_state = SyncState()
 
+        # Requests still waiting in the queue, by resource; a repeat is folded into the queued
+        # request (taking its newer timestamp and payload) because processing always fetches
+        # the resource's latest state
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+        # Set by stop(); the worker exits once the queue drains even if _SHUTDOWN never fit
+        self._stopping = threading.Event()
+
         # Start worker thread and git commit timer
         self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
         self.worker_thread.start()
@@ -27,25 +47,81 @@ class OperationsQueue:
         self.commit_timer_thread = threading.Thread(target=self._commit_timer_loop, daemon=True)
         self.commit_timer_thread.start()
 
-    def enqueue_sync_request(self, request: SyncRequest):
-        """Add a sync request to the processing queue"""
-        print(f"Enqueuing sync request for resource: {request.resource} at {request.timestamp}")
-        self.request_queue.put(request)
-
-    def enqueue_document_change(self, change_data: dict):
-        """Add a document change notification to the processing queue"""
-        print(
-            f"Enqueuing document change for relay: {change_data['relay_id']}, resource: {change_data['resource_id']} at {change_data['timestamp']}"
+    def enqueue_sync_request(self, request: SyncRequest) -> bool:
+        """Add a sync request to the processing queue, returning False if the queue is full"""
+        # Lazy %-formatting: nothing is rendered unless debug logging is enabled
+        logger.debug(
+            "Enqueuing sync request for resource: %s at %s", request.resource, request.timestamp
+        )
+        return self._try_put(request)
+
+    def enqueue_document_change(self, change_data: dict) -> bool:
+        """Add a document change notification to the processing queue, returning False if full"""
+        logger.debug(
+            "Enqueuing document change for relay: %s, resource: %s at %s",
+            change_data["relay_id"],
+            change_data["resource_id"],
+            change_data["timestamp"],
         )
-        self.request_queue.put(change_data)
+        return self._try_put(change_data)
+
+    def _try_put(self, item) -> bool:
+        """Put an item without blocking the caller (webhook handlers run on the event loop)"""
+        key = self._request_key(item)
+        with self._pending_lock:
+            pending = self._pending.get(key) if key is not None else None
+            if pending is not None:
+                self._merge_pending(pending, item)
+                logger.debug("Coalesced request into pending %s", key)
+                return True
+            try:
+                self.request_queue.put_nowait(item)
+            except queue.Full:
+                logger.warning(
+                    f"Operations queue full ({self.request_queue.maxsize}), dropping request"
+                )
+                return False
+            if key is not None:
+                self._pending[key] = item
+            return True
+
+    @staticmethod
+    def _merge_pending(pending, item):
+        """Update a still-queued request in place with a newer request for the same resource"""
+        if isinstance(pending, SyncRequest):
+            pending.timestamp = item.timestamp
+        else:
+            pending.update(item)
+
+    @staticmethod
+    def _request_key(item) -> Optional[tuple]:
+        """Identify the resource a queued item refers to, or None if it can't be coalesced"""
+        if isinstance(item, SyncRequest):
+            return ("sync", repr(item.resource))
+        if isinstance(item, dict) and "relay_id" in item:
+            return ("doc", item["relay_id"], item.get("resource_id"))
+        return None
 
     def _worker_loop(self):
         """Main worker loop that processes sync requests"""
         while True:
-            try:
-                # Get next request from queue (blocks until available)
-                request = self.request_queue.get(timeout=1.0)
+            if self._stopping.is_set() and self.request_queue.empty():
+                return
 
+            # Get next request from queue (blocks until available, no idle wake-ups)
+            request = self.request_queue.get()
+            if request is _SHUTDOWN:
+                self.request_queue.task_done()
+                return
+
+            # Once dequeued, new changes to this resource must queue again; read the request
+            # only after this, since until then a coalesced request may still update it
+            key = self._request_key(request)
+            if key is not None:
+                with self._pending_lock:
+                    self._pending.pop(key, None)
+
+            try:
                 # Process the request (could be SyncRequest or document change data)
                 if isinstance(request, SyncRequest):
                     result = self._process_with_state_management(request)
@@ -60,18 +136,15 @@ class OperationsQueue:
                     logger.warning(f"Unknown request type: {type(request)}")
                     continue
 
-                # Mark queue task as done
-                self.request_queue.task_done()
-
                 # If operations were performed, mark that we have changes
                 if result.success and result.operations:
                     self.sync_state.has_changes = True
 
-            except queue.Empty:
-                # Timeout - continue loop
-                continue
             except Exception as e:
                 logger.error(f"Error in worker loop: {e}")
+            finally:
+                # Every get() is matched by task_done() so waiters are always released
+                self.request_queue.task_done()
 
     def _process_with_state_management(self, request: SyncRequest) -> SyncResult:
         """Process sync request with proper state management"""
@@ -116,37 +189,62 @@ class OperationsQueue:
         if not self.sync_state.has_changes:
             return
 
+        # Snapshot before committing: work finished while the commit runs is not in it, so
+        # its operations and change flag must survive until the next commit
+        committed_operations = self.sync_state.snapshot_completed_operations()
+        self.sync_state.has_changes = False
+
         try:
             # Use the persistence manager from sync engine to commit changes
             committed = self.sync_engine.persistence_manager.commit_changes()
 
             if committed:
-                # Reset change flag
-                self.sync_state.has_changes = False
                 self.sync_state.last_git_commit = time.time()
+                self.sync_state.clear_committed_operations(committed_operations)
+            else:
+                self.sync_state.has_changes = True
 
         except Exception as e:
+            self.sync_state.has_changes = True
             logger.error(f"Error in commit timer: {e}")
 
     def wait_for_empty_queue(self, timeout: Optional[float] = None):
         """Wait for all queued requests to be processed"""
         try:
-            # Block until all tasks are done
-            if timeout:
-                # Python's join() doesn't support timeout, so we implement our own
-                start_time = time.time()
-                while not self.request_queue.empty():
-                    if time.time() - start_time > timeout:
-                        return False
-                    time.sleep(0.1)
-                return True
-            else:
+            if timeout is None:
                 self.request_queue.join()
                 return True
+
+            # Queue.join() with a deadline: sleep on the condition task_done() notifies
+            deadline = time.monotonic() + timeout
+            with self.request_queue.all_tasks_done:
+                while self.request_queue.unfinished_tasks:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.request_queue.all_tasks_done.wait(remaining)
+            return True
         except Exception as e:
             logger.error(f"Error waiting for queue to empty: {e}")
             return False
 
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Stop the worker after it finishes the requests queued so far
+
+        Returns False if the worker is still running after `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._stopping.set()
+        try:
+            # Wakes a worker idle in get(); a full queue means it is busy and will see the flag
+            self.request_queue.put(_SHUTDOWN, timeout=timeout)
+        except queue.Full:
+            logger.warning("Operations queue full, worker will stop once it drains")
+
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        self.worker_thread.join(remaining)
+        return not self.worker_thread.is_alive()
+
     def get_queue_size(self) -> int:
         """Get current queue size"""
         return self.request_queue.qsize()
@@ -1,16 +1,18 @@
 #!/usr/bin/env python3
 
+import hashlib
 import json
 import os
 import time
 import shutil
 import logging
+import mmap
 import traceback
 import signal
-import atexit
+import sys
 import threading
-import glob
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
 import git
 from s3rn import (
@@ -27,6 +29,102 @@ from git_config import GitConnectorConfig
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on repositories committed or pushed concurrently
+GIT_MAX_WORKERS = 8
+
+# Lets read-only git commands skip optional index.lock acquisition
+NO_OPTIONAL_LOCKS_ENV = {"GIT_OPTIONAL_LOCKS": "0"}
+
+# Total time shutdown waits for in-flight git operations before leaving their locks alone
+SHUTDOWN_LOCK_TIMEOUT = 5.0
+
+# Files at least this large are hashed through mmap instead of being read into memory
+MMAP_THRESHOLD = 1 << 20
+
+# Changed paths are staged in batches of this many to keep each git add command line short
+PATHSPEC_CHUNK_SIZE = 1000
+
+# Makes git treat pathspecs as literal file names, so "*", "[" and ":" in a name match only it
+LITERAL_PATHSPECS_ENV = {"GIT_LITERAL_PATHSPECS": "1"}
+
+# Upper bound on relays whose state files are loaded concurrently at startup
+STATE_LOAD_MAX_WORKERS = 8
+
+# Lock files git leaves directly inside .git when interrupted
+GIT_DIR_LOCK_FILES = ("index.lock", "config.lock", "HEAD.lock")
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 hex digest of a file's contents
+
+    Large files are hashed straight from a read-only mmap, so the page cache feeds
+    hashlib without first copying the whole file into a Python bytes object.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return hashlib.sha256(f.read()).hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def _state_digest(raw: bytes) -> bytes:
+    """Fingerprint serialized state to detect unchanged saves"""
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def _scandir_lock_files(directory: str):
+    """Yield paths of *.lock files directly inside directory"""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".lock") and entry.is_file(follow_symlinks=False):
+                    yield entry.path
+    except OSError:
+        return
+
+
+def _iter_git_lock_files(root: str):
+    """Yield candidate stale lock files for every git repository under root
+
+    Walks the tree once and stops descending at each repository, then only checks
+    the places git creates lock files: .git itself, refs/heads and refs/remotes/*.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        subdirs = []
+        git_dir = None
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    if entry.name == ".git":
+                        git_dir = entry.path
+                    else:
+                        subdirs.append(entry.path)
+        except OSError:
+            continue
+
+        if git_dir is None:
+            stack.extend(subdirs)
+            continue
+
+        for name in GIT_DIR_LOCK_FILES:
+            yield os.path.join(git_dir, name)
+        yield from _scandir_lock_files(os.path.join(git_dir, "refs", "heads"))
+        remotes_dir = os.path.join(git_dir, "refs", "remotes")
+        try:
+            with os.scandir(remotes_dir) as remotes:
+                remote_dirs = [entry.path for entry in remotes if entry.is_dir()]
+        except OSError:
+            remote_dirs = []
+        for remote_dir in remote_dirs:
+            yield from _scandir_lock_files(remote_dir)
+
 
 class SSHKeyManager:
     """Manage SSH keys for git authentication using key files"""
@@ -41,6 +139,7 @@ class SSHKeyManager:
         self.ssh_dir = os.path.join(data_dir, "ssh")
         self.private_key_path = os.path.join(self.ssh_dir, "git_sync_key")
         self.public_key_path = os.path.join(self.ssh_dir, "git_sync_key.pub")
+        self._public_key: Optional[str] = None  # Derived once in _setup_ssh_keys
 
         self._setup_ssh_keys()
 
@@ -64,6 +163,7 @@ class SSHKeyManager:
             with open(self.public_key_path, "w") as f:
                 f.write(public_key + "\n")
             os.chmod(self.public_key_path, 0o644)  # Read for owner and group
+            self._public_key = public_key
 
             logger.info(f"SSH keys written to {self.ssh_dir}")
             logger.info(f"Public key: {public_key[:50]}...")
@@ -111,7 +211,9 @@ class SSHKeyManager:
                 raise ValueError(f"Invalid private key format: {str(e)}")
 
     def get_public_key(self) -> str:
-        """Get public key from file"""
+        """Get public key derived at setup, falling back to the key file"""
+        if self._public_key is not None:
+            return self._public_key
         try:
             with open(self.public_key_path, "r") as f:
                 return f.read().strip()
@@ -127,14 +229,26 @@ class PersistenceManager:
     MIRROR_BASE_DIR = "repos"
     LOCAL_STATE_FILE = "local_state.json"
 
-    def __init__(self, data_dir: str = ".", git_config_file: Optional[str] = None):
+    def __init__(
+        self,
+        data_dir: str = ".",
+        git_config_file: Optional[str] = None,
+        git_config: Optional[GitConnectorConfig] = None,
+    ):
         self.data_dir = data_dir
         self.git_repos: Dict[str, git.Repo] = {}  # Now keyed by "relay_id/folder_id"
-        self.git_lock = threading.Lock()  # Prevent concurrent git operations
+        self._repo_locks: Dict[str, threading.Lock] = {}  # Serialize git operations per repo
+        self._repo_locks_meta = threading.Lock()  # Serializes lock creation only
+        self.commit_lock = threading.Lock()  # Serialize commit cycles across threads
+        self._shutdown_event = threading.Event()  # Set once shutdown starts; stops new commits
+        self._git_env: Dict[str, str] = {}  # Extra environment for every repo's git commands
 
         # Initialize git connector configuration first to get known hosts
-        config_path = git_config_file or os.path.join(self.data_dir, "git_connectors.toml")
-        self.git_config = GitConnectorConfig(config_path)
+        # (callers that already parsed the TOML file can pass it in as git_config)
+        if git_config is None:
+            config_path = git_config_file or os.path.join(self.data_dir, "git_connectors.toml")
+            git_config = GitConnectorConfig(config_path)
+        self.git_config = git_config
 
         # Initialize SSH key manager only if SSH_PRIVATE_KEY is set
         self.ssh_key_manager = None
@@ -144,8 +258,8 @@ class PersistenceManager:
             try:
                 self.ssh_key_manager = SSHKeyManager(self.data_dir, "SSH_PRIVATE_KEY")
                 print("SSH key manager initialized successfully")
-                # Set up SSH environment globally for all Git operations
-                self._setup_global_ssh_environment()
+                # Set up the SSH environment applied to all Git operations
+                self._setup_ssh_environment()
             except Exception as e:
                 logger.error(f"Failed to initialize SSH key manager: {e}")
                 logger.error("Git operations requiring SSH authentication will fail")
@@ -166,6 +280,11 @@ class PersistenceManager:
         # In-memory resource index (built from existing data sources)
         self.resource_index: Dict[str, Dict[str, Dict]] = {}  # keyed by relay_id then resource_id
         self.resource_index_lock = threading.RLock()  # Thread safety for resource index
+        self._base_abspaths: Dict[str, str] = {}  # _sanitize_path base dir -> absolute path
+
+        # Digest of each state file's contents as last read or written, so saves can
+        # skip files whose serialized state has not changed
+        self._state_digests: Dict[str, bytes] = {}
 
         # Setup graceful shutdown
         self._setup_signal_handlers()
@@ -203,45 +322,64 @@ class PersistenceManager:
         """Setup graceful shutdown handlers"""
 
         def shutdown_handler(signum, frame):
-            logger.info(f"Received signal {signum}, cleaning up...")
-            self._cleanup_git_lock_files()
-            exit(0)
+            # Flag shutdown so pooled threads start no new git work, then interrupt the main
+            # thread as the default handlers would. Lock cleanup is left to shutdown(), which
+            # the exit paths call once their finally blocks have released repository locks
+            self._shutdown_event.set()
+            if signum == signal.SIGINT:
+                raise KeyboardInterrupt
+            sys.exit(128 + signum)
 
         # Register signal handlers
         signal.signal(signal.SIGTERM, shutdown_handler)
         signal.signal(signal.SIGINT, shutdown_handler)
-        # Register atexit handler as well
-        atexit.register(self._cleanup_git_lock_files)
 
-    def _cleanup_git_lock_files(self):
-        """Clean up stale git lock files from all repositories"""
+    @property
+    def shutdown_requested(self) -> bool:
+        """Whether a shutdown signal arrived or shutdown() has started"""
+        return self._shutdown_event.is_set()
+
+    def shutdown(self, timeout: float = SHUTDOWN_LOCK_TIMEOUT):
+        """Stop new git work, then clean lock files in repositories no operation holds
+
+        Waits up to timeout overall for in-flight git operations to finish. A repository
+        whose lock cannot be taken is skipped: its lock files belong to a live operation,
+        and deleting them could corrupt the index. Startup cleanup catches anything left.
+        """
+        self._shutdown_event.set()
+        deadline = time.monotonic() + timeout
+        for repo_key in list(self.git_repos):
+            repo_lock = self._get_repo_lock(repo_key)
+            if not repo_lock.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                logger.warning(f"Git operation still running for {repo_key}, leaving its locks")
+                continue
+            try:
+                self._cleanup_git_lock_files(repo_key)
+            finally:
+                repo_lock.release()
+
+    def _cleanup_git_lock_files(self, repo_key: Optional[str] = None):
+        """Clean up stale git lock files from all repositories, or only from repo_key's"""
         try:
-            repos_dir = os.path.join(self.data_dir, self.MIRROR_BASE_DIR)
+            if repo_key:
+                repos_dir = self.get_folder_path(*repo_key.split("/", 1))
+            else:
+                repos_dir = os.path.join(self.data_dir, self.MIRROR_BASE_DIR)
             if not os.path.exists(repos_dir):
                 return
 
             logger.info("Cleaning up stale git lock files...")
             cleaned_count = 0
 
-            # Find all git lock files recursively
-            lock_patterns = [
-                "**/.git/index.lock",
-                "**/.git/config.lock",
-                "**/.git/refs/heads/*.lock",
-                "**/.git/refs/remotes/*/*.lock",
-                "**/.git/HEAD.lock",
-            ]
-
-            for pattern in lock_patterns:
-                lock_files = glob.glob(os.path.join(repos_dir, pattern), recursive=True)
-                for lock_file in lock_files:
-                    try:
-                        if os.path.exists(lock_file):
-                            os.remove(lock_file)
-                            cleaned_count += 1
-                            logger.info(f"Removed stale git lock file: {lock_file}")
-                    except Exception as e:
-                        logger.warning(f"Could not remove lock file {lock_file}: {e}")
+            for lock_file in _iter_git_lock_files(repos_dir):
+                try:
+                    os.remove(lock_file)
+                    cleaned_count += 1
+                    logger.info(f"Removed stale git lock file: {lock_file}")
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Could not remove lock file {lock_file}: {e}")
 
             if cleaned_count > 0:
                 logger.info(f"Cleaned up {cleaned_count} stale git lock files")
@@ -261,26 +399,28 @@ class PersistenceManager:
             state_base_dir = os.path.join(self.data_dir, "state")
             if os.path.exists(state_base_dir):
                 # Scan all relay state directories
-                for relay_id in os.listdir(state_base_dir):
-                    relay_state_dir = os.path.join(state_base_dir, relay_id)
-                    if not os.path.isdir(relay_state_dir):
-                        continue
-
-                    # Load persistent data to get folder information
-                    self.load_persistent_data(relay_id)
-
-                    # Initialize Git repos for all folders in this relay
-                    filemeta_folders = self.filemeta_folders.get(relay_id, {})
-                    for folder_id in filemeta_folders.keys():
-                        try:
-                            self.init_git_repo(relay_id, folder_id)
-                            # Auto-configure git remote if connector exists
-                            self._auto_configure_git_remote(relay_id, folder_id)
-                            initialized_count += 1
-                        except Exception as e:
-                            logger.error(
-                                f"Failed to initialize Git repo for folder {folder_id} in relay {relay_id}: {e}"
-                            )
+                relay_ids = [entry.name for entry in os.scandir(state_base_dir) if entry.is_dir()]
+
+                # Load persistent data to get folder information; relays are
+                # independent, so overlap their file reads
+                if relay_ids:
+                    max_workers = min(STATE_LOAD_MAX_WORKERS, len(relay_ids))
+                    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                        list(executor.map(self.load_persistent_data, relay_ids))
+
+                # Initialize Git repos for all folders; opening, cloning and pulling
+                # are per-repository and mostly network-bound, so overlap them
+                folders = [
+                    (relay_id, folder_id)
+                    for relay_id in relay_ids
+                    for folder_id in self.filemeta_folders.get(relay_id, {})
+                ]
+                if folders:
+                    max_workers = min(GIT_MAX_WORKERS, len(folders))
+                    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                        initialized_count += sum(
+                            executor.map(lambda folder: self._init_folder_repo(*folder), folders)
+                        )
 
             # Second: Initialize repos from TOML configuration (even without prior state)
             toml_initialized_count = self._initialize_git_repos_from_toml()
@@ -294,6 +434,19 @@ class PersistenceManager:
         except Exception as e:
             logger.error(f"Error during Git repository initialization: {e}")
 
+    def _init_folder_repo(self, relay_id: str, folder_id: str) -> bool:
+        """Initialize one folder's Git repository and its remote from existing state"""
+        try:
+            self.init_git_repo(relay_id, folder_id)
+            # Auto-configure git remote if connector exists
+            self._auto_configure_git_remote(relay_id, folder_id)
+            return True
+        except Exception as e:
+            logger.error(
+                f"Failed to initialize Git repo for folder {folder_id} in relay {relay_id}: {e}"
+            )
+            return False
+
     def _initialize_git_repos_from_toml(self) -> int:
         """Initialize Git repositories from TOML configuration, creating minimal state as needed"""
         try:
@@ -303,6 +456,8 @@ class PersistenceManager:
 
             logger.info("Initializing Git repositories from TOML configuration...")
             initialized_count = 0
+            loaded_relays = set()
+            dirty_relays = set()
 
             for connector in self.git_config.connectors:
                 try:
@@ -315,8 +470,10 @@ class PersistenceManager:
                         logger.debug(f"Git repo already exists for {repo_key}, skipping")
                         continue
 
-                    # Ensure relay data is loaded (creates empty state if needed)
-                    self.load_persistent_data(relay_id)
+                    # Ensure relay data is loaded once (creates empty state if needed)
+                    if relay_id not in loaded_relays:
+                        self.load_persistent_data(relay_id)
+                        loaded_relays.add(relay_id)
 
                     # Create minimal folder state if it doesn't exist
                     if folder_id not in self.filemeta_folders[relay_id]:
@@ -324,9 +481,7 @@ class PersistenceManager:
                             f"Creating minimal folder state for {relay_id}/{folder_id} from TOML config"
                         )
                         self.filemeta_folders[relay_id][folder_id] = {}
-
-                        # Save the minimal state
-                        self.save_persistent_data(relay_id)
+                        dirty_relays.add(relay_id)
 
                     # Initialize Git repository
                     self.init_git_repo(relay_id, folder_id)
@@ -352,14 +507,22 @@ class PersistenceManager:
                         f"Failed to initialize Git repo from TOML for {connector.relay_id}/{connector.shared_folder_id}: {e}"
                     )
 
+            # Save the minimal state once per relay rather than once per connector
+            for relay_id in dirty_relays:
+                self.save_persistent_data(relay_id)
+
             return initialized_count
 
         except Exception as e:
             logger.error(f"Error initializing Git repositories from TOML: {e}")
             return 0
 
-    def _setup_global_ssh_environment(self):
-        """Set up SSH environment variables globally for all Git operations"""
+    def _setup_ssh_environment(self):
+        """Set up SSH environment variables for all Git operations
+
+        The variables are attached to each repository's git command wrapper rather
+        than os.environ, so concurrent operations never race on process-wide state.
+        """
         if not self.ssh_key_manager:
             return
 
@@ -369,15 +532,33 @@ class PersistenceManager:
         # Set up SSH command to use the key file
         # Let run.sh handle known_hosts with ssh-keyscan
         ssh_command = f"ssh -o LogLevel=ERROR -o PasswordAuthentication=no -o PreferredAuthentications=publickey -o ConnectTimeout=10 -i {private_key_path}"
-        os.environ["GIT_SSH_COMMAND"] = ssh_command
-
-        logger.info(f"Global SSH setup - Using SSH command: {ssh_command}")
-        logger.info(f"Global SSH setup - Private key: {private_key_path}")
-        logger.info("Global SSH setup - Known hosts handled by run.sh")
-
-    def _safe_git_operation(self, func, *args, **kwargs):
-        """Execute git operation with locking and error recovery"""
-        with self.git_lock:
+        self._git_env["GIT_SSH_COMMAND"] = ssh_command
+
+        logger.info(f"SSH setup - Using SSH command: {ssh_command}")
+        logger.info(f"SSH setup - Private key: {private_key_path}")
+        logger.info("SSH setup - Known hosts handled by run.sh")
+
+    def _with_git_env(self, git_repo: git.Repo) -> git.Repo:
+        """Apply the shared git environment to a repository's commands"""
+        if self._git_env:
+            git_repo.git.update_environment(**self._git_env)
+        return git_repo
+
+    def _get_repo_lock(self, repo_key: Optional[str]) -> threading.Lock:
+        """Get or create the lock serializing git operations on one repository"""
+        lock = self._repo_locks.get(repo_key)
+        if lock is None:
+            with self._repo_locks_meta:
+                lock = self._repo_locks.setdefault(repo_key, threading.Lock())
+        return lock
+
+    def _safe_git_operation(self, func, *args, repo_key: Optional[str] = None, **kwargs):
+        """Execute git operation with locking and error recovery
+
+        Git only contends within a repository, so operations are serialized per
+        repo_key and different repositories can proceed concurrently.
+        """
+        with self._get_repo_lock(repo_key):
             try:
                 return func(*args, **kwargs)
             except git.exc.GitCommandError as e:
@@ -386,7 +567,7 @@ class PersistenceManager:
                     logger.warning(
                         f"Git operation failed due to lock file, attempting cleanup: {e}"
                     )
-                    self._cleanup_git_lock_files()
+                    self._cleanup_git_lock_files(repo_key)
                     time.sleep(1)  # Brief pause before retry
                     return func(*args, **kwargs)
                 else:
@@ -396,7 +577,7 @@ class PersistenceManager:
         """Execute git fetch with enhanced debugging for SSH issues"""
         try:
             # Log SSH environment details
-            git_ssh_command = os.environ.get("GIT_SSH_COMMAND")
+            git_ssh_command = self._git_env.get("GIT_SSH_COMMAND")
 
             logger.info(f"Git fetch debug for {repo_key}:")
             logger.info(f"  GIT_SSH_COMMAND: {git_ssh_command}")
@@ -417,7 +598,7 @@ class PersistenceManager:
                 logger.info("  Known hosts handled by run.sh")
 
             # Perform the fetch
-            self._safe_git_operation(lambda: origin.fetch())
+            self._safe_git_operation(lambda: origin.fetch(), repo_key=repo_key)
 
         except git.exc.GitCommandError as e:
             logger.error(f"Git fetch failed for {repo_key}: {e}")
@@ -483,62 +664,81 @@ class PersistenceManager:
         # Ensure state directory exists
         os.makedirs(self.get_state_dir(relay_id), exist_ok=True)
 
-        # Load document hashes
-        hashes_path = self.get_hashes_file_path(relay_id)
-        if os.path.exists(hashes_path):
-            try:
-                with open(hashes_path, "r") as f:
-                    self.document_hashes[relay_id] = json.load(f)
-            except Exception as e:
-                logger.error(f"Error loading document hashes for relay {relay_id}: {e}")
-                self.document_hashes[relay_id] = {}
-
-        # Load filemeta
-        filemeta_path = self.get_filemeta_file_path(relay_id)
-        if os.path.exists(filemeta_path):
-            try:
-                with open(filemeta_path, "r") as f:
-                    self.filemeta_folders[relay_id] = json.load(f)
-            except Exception as e:
-                logger.error(f"Error loading filemeta for relay {relay_id}: {e}")
-                self.filemeta_folders[relay_id] = {}
-
-        # Load local file state
-        local_state_path = self.get_local_state_file_path(relay_id)
-        if os.path.exists(local_state_path):
-            try:
-                with open(local_state_path, "r") as f:
-                    self.local_file_state[relay_id] = json.load(f)
-            except Exception as e:
-                logger.error(f"Error loading local state for relay {relay_id}: {e}")
-                self.local_file_state[relay_id] = {}
+        # Missing files keep the in-memory state; unreadable ones reset it
+        for store, path, description in (
+            (self.document_hashes, self.get_hashes_file_path(relay_id), "document hashes"),
+            (self.filemeta_folders, self.get_filemeta_file_path(relay_id), "filemeta"),
+            (self.local_file_state, self.get_local_state_file_path(relay_id), "local state"),
+        ):
+            data = self._read_json(path, f"{description} for relay {relay_id}")
+            if data is not None:
+                store[relay_id] = data
 
         # Build resource index from loaded data
         with self.resource_index_lock:
             self._build_resource_index(relay_id)
 
-    def save_persistent_data(self, relay_id: str):
-        """Save document hashes, filemeta, and local state for a specific relay"""
-        # Ensure state directory exists
-        os.makedirs(self.get_state_dir(relay_id), exist_ok=True)
+    def _read_json(self, path: str, description: str) -> Optional[Any]:
+        """Read a JSON state file
 
+        Returns None if the file does not exist and {} if it cannot be parsed.
+        """
         try:
-            with open(self.get_hashes_file_path(relay_id), "w") as f:
-                json.dump(self.document_hashes.get(relay_id, {}), f, indent=2)
+            with open(path, "rb") as f:
+                raw = f.read()
+            data = json.loads(raw)
+            self._state_digests[path] = _state_digest(raw)
+            return data
+        except FileNotFoundError:
+            return None
         except Exception as e:
-            logger.error(f"Error saving document hashes for relay {relay_id}: {e}")
+            logger.error(f"Error loading {description}: {e}")
+            return {}
 
-        try:
-            with open(self.get_filemeta_file_path(relay_id), "w") as f:
-                json.dump(self.filemeta_folders.get(relay_id, {}), f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving filemeta for relay {relay_id}: {e}")
+    def _atomic_write_json(self, path: str, data: Any) -> bool:
+        """Write JSON to a temporary file and rename it over path
 
+        A crash mid-write leaves the previous file intact instead of truncated JSON,
+        which load_persistent_data would otherwise discard as unreadable.
+
+        Returns:
+            bool: False if the file already held this content and was left untouched
+        """
+        raw = json.dumps(data, indent=2).encode("utf-8")
+        digest = _state_digest(raw)
+        if self._state_digests.get(path) == digest:
+            return False
+
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
         try:
-            with open(self.get_local_state_file_path(relay_id), "w") as f:
-                json.dump(self.local_file_state.get(relay_id, {}), f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving local state for relay {relay_id}: {e}")
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._state_digests[path] = digest
+        return True
+
+    def save_persistent_data(self, relay_id: str):
+        """Save document hashes, filemeta, and local state for a specific relay"""
+        # Ensure state directory exists
+        os.makedirs(self.get_state_dir(relay_id), exist_ok=True)
+
+        for data, path, description in (
+            (self.document_hashes, self.get_hashes_file_path(relay_id), "document hashes"),
+            (self.filemeta_folders, self.get_filemeta_file_path(relay_id), "filemeta"),
+            (self.local_file_state, self.get_local_state_file_path(relay_id), "local state"),
+        ):
+            try:
+                self._atomic_write_json(path, data.get(relay_id, {}))
+            except Exception as e:
+                logger.error(f"Error saving {description} for relay {relay_id}: {e}")
 
         # Rebuild resource index after saving data
         with self.resource_index_lock:
@@ -553,15 +753,16 @@ class PersistenceManager:
 
         try:
             # Try to open existing repo
-            self.git_repos[repo_key] = git.Repo(folder_path)
+            self.git_repos[repo_key] = self._with_git_env(git.Repo(folder_path))
             print(
                 f"Using existing git repository for folder {folder_id} in relay {relay_id} at {folder_path}"
             )
 
             # If repo exists and has remotes, pull latest changes
             git_repo = self.git_repos[repo_key]
-            if git_repo.remotes:
-                self._pull_from_remote(repo_key, git_repo)
+            origin = self._default_remote(git_repo)
+            if origin is not None:
+                self._pull_from_remote(repo_key, git_repo, origin)
 
         except git.InvalidGitRepositoryError:
             # Repository doesn't exist locally, check if we should clone from remote
@@ -570,8 +771,13 @@ class PersistenceManager:
                 # Clone from remote
                 try:
                     print(f"Cloning repository from {connector.url} for folder {folder_id}")
-                    self.git_repos[repo_key] = git.Repo.clone_from(
-                        connector.url, folder_path, branch=connector.branch
+                    self.git_repos[repo_key] = self._with_git_env(
+                        git.Repo.clone_from(
+                            connector.url,
+                            folder_path,
+                            branch=connector.branch,
+                            env=self._git_env or None,
+                        )
                     )
                     print(f"Successfully cloned repository to {folder_path}")
                     return self.git_repos[repo_key]
@@ -580,7 +786,9 @@ class PersistenceManager:
                     # Fall through to create new repo
 
             # Create new repo
-            self.git_repos[repo_key] = git.Repo.init(folder_path, initial_branch="main")
+            self.git_repos[repo_key] = self._with_git_env(
+                git.Repo.init(folder_path, initial_branch="main")
+            )
             print(
                 f"Initialized new git repository for folder {folder_id} in relay {relay_id} at {folder_path} with main branch"
             )
@@ -600,7 +808,9 @@ class PersistenceManager:
                 with open(gitignore_path, "w") as f:
                     f.write("# Y-Sweet sync repository - content only\n")
 
-                self.git_repos[repo_key].index.add([".gitignore"])
+                # git add runs in the repo's directory; index.add() would os.chdir the
+                # whole process, which is unsafe while other repos initialize in parallel
+                self.git_repos[repo_key].git.add(".gitignore")
                 self.git_repos[repo_key].index.commit("Initial commit")
                 print(f"Created initial git commit for folder {folder_id} in relay {relay_id}")
 
@@ -618,9 +828,9 @@ class PersistenceManager:
                 return False
 
             # Check if remote already exists
-            if remote_name in [r.name for r in git_repo.remotes]:
+            remote = next((r for r in git_repo.remotes if r.name == remote_name), None)
+            if remote is not None:
                 # Update existing remote URL
-                remote = git_repo.remotes[remote_name]
                 remote.set_url(remote_url)
                 print(
                     f"Updated remote '{remote_name}' URL for folder {folder_id} in relay {relay_id}: {remote_url}"
@@ -673,7 +883,7 @@ class PersistenceManager:
                 logger.error(f"No git repository found for folder {folder_id} in relay {relay_id}")
                 return False
 
-            self._push_to_remote(repo_key, git_repo)
+            self._push_to_remote(repo_key, git_repo, self._default_remote(git_repo))
             return True
 
         except Exception as e:
@@ -686,16 +896,28 @@ class PersistenceManager:
         Returns:
             int: Number of repositories successfully pushed
         """
-        pushed_count = 0
-        for repo_key, git_repo in self.git_repos.items():
-            if git_repo.remotes:
-                try:
-                    self._push_to_remote(repo_key, git_repo)
-                    pushed_count += 1
-                except Exception as e:
-                    logger.error(f"Failed to push repository {repo_key}: {e}")
+        # Resolve each repository's remote once; every read of git_repo.remotes parses config
+        repos = []
+        for repo_key, git_repo in list(self.git_repos.items()):
+            origin = self._default_remote(git_repo)
+            if origin is not None:
+                repos.append((repo_key, git_repo, origin))
+        if not repos:
+            return 0
+
+        def push(repo_key: str, git_repo: git.Repo, origin: git.Remote) -> bool:
+            if self._shutdown_event.is_set():
+                return False
+            try:
+                self._push_to_remote(repo_key, git_repo, origin)
+                return True
+            except Exception as e:
+                logger.error(f"Failed to push repository {repo_key}: {e}")
+                return False
 
-        return pushed_count
+        # Pushes are network-bound and only contend within a repository
+        with ThreadPoolExecutor(max_workers=min(GIT_MAX_WORKERS, len(repos))) as executor:
+            return sum(executor.map(lambda item: push(*item), repos))
 
     def commit_changes(self) -> bool:
         """Commit changes to git repositories if there are any, and push to remote if configured
@@ -703,52 +925,111 @@ class PersistenceManager:
         Returns:
             bool: True if any commits were made, False otherwise
         """
+        with self.commit_lock:
+            try:
+                repos = list(self.git_repos.items())
+                if not repos:
+                    return False
+
+                # Each repository is committed and pushed independently, so run them concurrently
+                with ThreadPoolExecutor(max_workers=min(GIT_MAX_WORKERS, len(repos))) as executor:
+                    results = list(executor.map(lambda item: self._commit_repo(*item), repos))
+                return any(results)
+
+            except Exception as e:
+                logger.error(f"Error committing to git: {e}")
+                logger.error(f"Git commit traceback: {traceback.format_exc()}")
+                return False
+
+    def _commit_repo(self, repo_key: str, git_repo: git.Repo) -> bool:
+        """Commit and push one folder repository if it has changes
+
+        Returns:
+            bool: True if a commit was made, False otherwise
+        """
+        if self._shutdown_event.is_set():
+            return False
+
         try:
-            committed_any = False
-            # Check each folder repository for changes
-            for repo_key, git_repo in self.git_repos.items():
-                if git_repo.is_dirty() or git_repo.untracked_files:
-                    # Pull latest changes before committing if remote is configured
-                    if git_repo.remotes:
-                        self._pull_from_remote(repo_key, git_repo)
+            changed_paths = self._changed_paths(git_repo)
+            if changed_paths is None:
+                return False
 
-                    # Add all changes using safe git operation
-                    self._safe_git_operation(lambda: git_repo.git.add(A=True))
+            # Resolve the remote once for this cycle's pull and push
+            origin = self._default_remote(git_repo)
 
-                    # Create commit message
-                    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                    commit_msg = f"Auto-sync: {timestamp}"
+            # Pull latest changes before committing if remote is configured
+            if origin is not None:
+                self._pull_from_remote(repo_key, git_repo, origin)
 
-                    # Commit changes using safe git operation
-                    self._safe_git_operation(lambda: git_repo.index.commit(commit_msg))
-                    print(f"Git commit for repository {repo_key}: {commit_msg}")
-                    committed_any = True
+            # Stage only the paths status reported instead of rescanning the whole tree
+            def stage_changed_paths():
+                for start in range(0, len(changed_paths), PATHSPEC_CHUNK_SIZE):
+                    chunk = changed_paths[start : start + PATHSPEC_CHUNK_SIZE]
+                    git_repo.git.add("-A", "--", *chunk, env=LITERAL_PATHSPECS_ENV)
 
-                    # Push to remote if configured
-                    self._push_to_remote(repo_key, git_repo)
+            self._safe_git_operation(stage_changed_paths, repo_key=repo_key)
 
-            return committed_any
+            # Create commit message
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            commit_msg = f"Auto-sync: {timestamp}"
+
+            # Commit changes using safe git operation
+            self._safe_git_operation(lambda: git_repo.index.commit(commit_msg), repo_key=repo_key)
+            print(f"Git commit for repository {repo_key}: {commit_msg}")
+
+            # Push to remote if configured
+            self._push_to_remote(repo_key, git_repo, origin)
+            return True
 
         except Exception as e:
-            logger.error(f"Error committing to git: {e}")
+            logger.error(f"Error committing to git for repository {repo_key}: {e}")
             logger.error(f"Git commit traceback: {traceback.format_exc()}")
             return False
 
-    def _pull_from_remote(self, repo_key: str, git_repo: git.Repo):
-        """Pull latest changes from remote repository using rebase"""
+    def _changed_paths(self, git_repo: git.Repo) -> Optional[List[str]]:
+        """List worktree paths that need staging, from a single git status call
+
+        Returns None when the repository is clean. Paths whose changes are already
+        staged are left out, so the list can be empty for a repository that is dirty.
+        GIT_OPTIONAL_LOCKS=0 stops status from taking index.lock to refresh the index,
+        so the probe never collides with a concurrent add/commit on the same repository.
+        """
+        status = git_repo.git.status(
+            "--porcelain", "-z", "--untracked-files=normal", env=NO_OPTIONAL_LOCKS_ENV
+        )
+        if not status:
+            return None
+
+        paths = []
+        entries = iter(status.split("\0"))
+        for entry in entries:
+            if not entry:
+                continue
+            if entry[1] != " ":
+                paths.append(entry[3:])
+            if entry[0] in "RC":
+                # Renames and copies are followed by their already-staged source path
+                next(entries, None)
+        return paths
+
+    def _default_remote(self, git_repo: git.Repo) -> Optional[git.Remote]:
+        """Get the 'origin' remote, else the first one, or None if there are no remotes
+
+        Every access to git_repo.remotes re-reads the repository config, so read it once.
+        """
+        remotes = git_repo.remotes
+        if not remotes:
+            return None
+        return next((remote for remote in remotes if remote.name == "origin"), remotes[0])
+
+    def _pull_from_remote(self, repo_key: str, git_repo: git.Repo, origin: Optional[git.Remote]):
+        """Pull latest changes from origin, as resolved by _default_remote(), using rebase"""
         try:
-            # Check if any remotes are configured
-            if not git_repo.remotes:
+            if origin is None:
                 logger.debug(f"No remotes configured for repository {repo_key}, skipping pull")
                 return
 
-            # Get the default remote (usually 'origin')
-            origin = (
-                git_repo.remotes.origin
-                if "origin" in [r.name for r in git_repo.remotes]
-                else git_repo.remotes[0]
-            )
-
             # Check if we have any local commits that need to be preserved
             try:
                 current_branch = git_repo.active_branch
@@ -764,7 +1045,7 @@ class PersistenceManager:
                 # so it is stale whenever anything else (another connector, a human)
                 # pushed last. Refresh it or the ahead/behind comparison below is
                 # against a snapshot and we commit on a stale parent.
-                self._safe_git_operation(lambda: origin.fetch())
+                self._safe_git_operation(lambda: origin.fetch(), repo_key=repo_key)
 
                 # Check if local branch is ahead of remote
                 ahead_behind = git_repo.git.rev_list(
@@ -783,7 +1064,8 @@ class PersistenceManager:
                             self._safe_git_operation(
                                 lambda: git_repo.git.pull(
                                     "--rebase", origin.name, current_branch.name
-                                )
+                                ),
+                                repo_key=repo_key,
                             )
                             print(f"Successfully rebased {repo_key}")
                         except git.exc.GitCommandError as rebase_error:
@@ -811,7 +1093,8 @@ class PersistenceManager:
 
                                     # Try merge approach
                                     self._safe_git_operation(
-                                        lambda: git_repo.git.pull(origin.name, current_branch.name)
+                                        lambda: git_repo.git.pull(origin.name, current_branch.name),
+                                        repo_key=repo_key,
                                     )
 
                                     # Resolve any merge conflicts
@@ -828,7 +1111,8 @@ class PersistenceManager:
                         # Only behind - fast-forward pull
                         print(f"Fast-forward pull from {origin.name} for repository {repo_key}")
                         self._safe_git_operation(
-                            lambda: git_repo.git.pull(origin.name, current_branch.name)
+                            lambda: git_repo.git.pull(origin.name, current_branch.name),
+                            repo_key=repo_key,
                         )
                 else:
                     # Up to date or only ahead
@@ -885,8 +1169,8 @@ class PersistenceManager:
                 if is_our_file:
                     # Resolve in our favor - use our version
                     try:
-                        git_repo.git.checkout("--ours", file_path)
-                        git_repo.git.add(file_path)
+                        git_repo.git.checkout("--ours", "--", file_path, env=LITERAL_PATHSPECS_ENV)
+                        git_repo.git.add("--", file_path, env=LITERAL_PATHSPECS_ENV)
                         resolved_count += 1
                         logger.debug(f"Resolved conflict for {file_path} in favor of our version")
                     except Exception as e:
@@ -894,8 +1178,10 @@ class PersistenceManager:
                 else:
                     # Not our file - use their version to preserve external changes
                     try:
-                        git_repo.git.checkout("--theirs", file_path)
-                        git_repo.git.add(file_path)
+                        git_repo.git.checkout(
+                            "--theirs", "--", file_path, env=LITERAL_PATHSPECS_ENV
+                        )
+                        git_repo.git.add("--", file_path, env=LITERAL_PATHSPECS_ENV)
                         skipped_count += 1
                         logger.debug(
                             f"Resolved conflict for {file_path} in favor of their version (external file)"
@@ -911,7 +1197,7 @@ class PersistenceManager:
             logger.error(f"Error during conflict resolution for {repo_key}: {e}")
             logger.error(f"Conflict resolution traceback: {traceback.format_exc()}")
 
-    def _push_and_verify(self, origin, *args, **kwargs):
+    def _push_and_verify(self, origin, *args, repo_key: Optional[str] = None, **kwargs):
         """Push and raise GitCommandError if any ref was rejected.
 
         Remote.push() does not raise on rejected refs: when porcelain output was
@@ -919,7 +1205,9 @@ class PersistenceManager:
         the returned PushInfo flags. Raising here lets callers route rejections
         into the existing pull-and-retry recovery path.
         """
-        push_infos = self._safe_git_operation(lambda: origin.push(*args, **kwargs))
+        push_infos = self._safe_git_operation(
+            lambda: origin.push(*args, **kwargs), repo_key=repo_key
+        )
         failed = [
             info
             for info in push_infos
@@ -934,34 +1222,28 @@ class PersistenceManager:
                 + "; ".join(info.summary.strip() for info in failed),
             )
 
-    def _push_to_remote(self, repo_key: str, git_repo: git.Repo):
-        """Push commits to remote repository if configured"""
+    def _push_to_remote(self, repo_key: str, git_repo: git.Repo, origin: Optional[git.Remote]):
+        """Push commits to origin, as resolved by _default_remote(), if configured"""
         try:
-            # Check if any remotes are configured
-            if not git_repo.remotes:
+            if origin is None:
                 logger.debug(f"No remotes configured for repository {repo_key}, skipping push")
                 return
 
-            # Get the default remote (usually 'origin')
-            origin = (
-                git_repo.remotes.origin
-                if "origin" in [r.name for r in git_repo.remotes]
-                else git_repo.remotes[0]
-            )
-
             # Check if current branch has an upstream
             try:
                 current_branch = git_repo.active_branch
                 if current_branch.tracking_branch() is None:
                     # Set upstream for first push
-                    self._push_and_verify(origin, current_branch.name, set_upstream=True)
+                    self._push_and_verify(
+                        origin, current_branch.name, set_upstream=True, repo_key=repo_key
+                    )
                     print(
                         f"Git push (set upstream) for repository {repo_key} to {origin.name}/{current_branch.name}"
                     )
                 else:
                     # Regular push - don't force to avoid clobbering other commits
                     try:
-                        self._push_and_verify(origin)
+                        self._push_and_verify(origin, repo_key=repo_key)
                         print(
                             f"Git push for repository {repo_key} to {origin.name}/{current_branch.name}"
                         )
@@ -972,11 +1254,11 @@ class PersistenceManager:
                             logger.info(
                                 f"Push rejected for {repo_key}, pulling remote changes first"
                             )
-                            self._pull_from_remote(repo_key, git_repo)
+                            self._pull_from_remote(repo_key, git_repo, origin)
 
                             # Try pushing again after pull
                             try:
-                                self._push_and_verify(origin)
+                                self._push_and_verify(origin, repo_key=repo_key)
                                 print(f"Git push successful after pull for repository {repo_key}")
                             except git.exc.GitCommandError:
                                 # If still failing, there might be an issue - log but don't force
@@ -1032,12 +1314,15 @@ class PersistenceManager:
         if any(part == ".." for part in clean_path.split("/")):
             raise ValueError(f"Path '{path}' contains directory traversal sequences")
 
-        # Build the full path
-        full_path = os.path.join(base_directory, clean_path)
+        # Base directories repeat for every file in a folder, so resolve each once
+        base_absolute = self._base_abspaths.get(base_directory)
+        if base_absolute is None:
+            base_absolute = self._base_abspaths.setdefault(
+                base_directory, os.path.abspath(base_directory)
+            )
 
-        # Normalize and make absolute
-        normalized_path = os.path.abspath(full_path)
-        base_absolute = os.path.abspath(base_directory)
+        # Build the full path and normalize it against the absolute base
+        normalized_path = os.path.normpath(os.path.join(base_absolute, clean_path))
 
         # Ensure the path is within the base directory but not the base directory itself
         if normalized_path == base_absolute:
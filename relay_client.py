@@ -1,18 +1,93 @@
 #!/usr/bin/env python3
 
 import logging
+import random
+import string
 import traceback
 import requests
 import json
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any
 from urllib.parse import urlparse, urlunparse
-from y_sweet_sdk import DocumentManager
+from y_sweet_sdk import DocConnection, DocumentManager, YSweetError
 from pycrdt import Doc, Text, Map
 from s3rn import S3RNType, S3RN, S3RemoteFolder, S3RemoteDocument, S3RemoteFile, S3RemoteCanvas
 from models import ResourceType, get_s3rn_resource_category
 
 logger = logging.getLogger(__name__)
 
+# Connection pool sizing for the shared HTTP session (startup sync fans out across threads)
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 64
+
+
+class SessionDocConnection(DocConnection):
+    """DocConnection that sends its requests through a shared requests.Session"""
+
+    def __init__(self, client_token: Dict[str, str], session: requests.Session):
+        super().__init__(client_token)
+        self.session = session
+
+    def _do_request(
+        self, path: str, method: str = "GET", data: Optional[bytes] = None
+    ) -> requests.Response:
+        # Same request as DocConnection._do_request, sent over the pooled session
+        url = f"{self.base_url}/{path}"
+        response = self.session.request(method, url, headers=self.headers, data=data)
+        response.raise_for_status()
+        return response
+
+
+class SessionDocumentManager(DocumentManager):
+    """DocumentManager whose requests go through a shared requests.Session
+
+    y_sweet_sdk sends every call through module-level requests.request, which opens a new
+    connection each time. Only the SDK's request helpers are overridden; they mirror its
+    own request (including the "z" cache-busting param) and YSweetError mapping, so the
+    SDK's public methods behave as before over pooled connections.
+    """
+
+    def __init__(self, connection_string: str, session: requests.Session):
+        super().__init__(connection_string)
+        self.session = session
+
+    def _do_request(
+        self, path: str, method: str = "GET", data: Optional[Dict] = None
+    ) -> requests.Response:
+        url = f"{self.base_url}/{path}"
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        cache_buster = "".join(random.choices(string.ascii_lowercase + string.digits, k=8))
+
+        try:
+            response = self.session.request(
+                method, url, headers=headers, json=data, params={"z": cache_buster}
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise self._request_error(e, url) from e
+        except Exception as e:
+            raise YSweetError({"code": "Unknown", "message": str(e)}) from e
+
+        return response
+
+    def _request_error(self, e: requests.RequestException, url: str) -> YSweetError:
+        """Map a failed request to the YSweetError the SDK would raise for it"""
+        if isinstance(e, requests.ConnectionError):
+            return YSweetError({"code": "ServerRefused", "url": url})
+        if isinstance(e, requests.HTTPError):
+            status = e.response.status_code
+            if status == 401:
+                code = "InvalidAuthProvided" if self.token else "NoAuthProvided"
+                return YSweetError({"code": code})
+            code = "NotFound" if status == 404 else "ServerError"
+            return YSweetError(
+                {"code": code, "status": status, "message": e.response.reason, "url": url}
+            )
+        return YSweetError({"code": "Unknown", "message": str(e)})
+
+    def get_connection(self, doc_id: str) -> SessionDocConnection:
+        return SessionDocConnection(self.get_client_token(doc_id), self.session)
+
 
 class RelayClient:
     """Wrapper around Y-Sweet DocumentManager with authentication handling"""
@@ -20,9 +95,20 @@ class RelayClient:
     def __init__(self, relay_server_url: str, relay_server_api_key: Optional[str] = None):
         self.relay_server_url = relay_server_url
         self.relay_server_api_key = relay_server_api_key
+        self.session = self._init_session()
         self.dm = self._init_document_manager()
 
-    def _init_document_manager(self) -> DocumentManager:
+    def _init_session(self) -> requests.Session:
+        """Create one pooled HTTP session so relay and S3 calls reuse TCP/TLS connections"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _init_document_manager(self) -> SessionDocumentManager:
         """Initialize DocumentManager with configurable server and authentication"""
         if not self.relay_server_url:
             raise ValueError("Relay server URL is required")
@@ -43,10 +129,10 @@ class RelayClient:
                 )
             )
             logger.debug(f"Connecting to relay server with API key authentication")
-            return DocumentManager(connection_string)
+            return SessionDocumentManager(connection_string, self.session)
         else:
             logger.debug(f"Connecting to relay server: {self.relay_server_url}")
-            return DocumentManager(self.relay_server_url)
+            return SessionDocumentManager(self.relay_server_url, self.session)
 
     def get_doc_as_update(self, doc_id: str) -> bytes:
         """Get document update from Y-Sweet server"""
@@ -169,7 +255,7 @@ class RelayClient:
             # Download file content from presigned URL (don't log full URL - contains signature)
             logger.debug(f"🌐 S3 FILE DOWNLOAD REQUEST")
 
-            download_response = requests.get(download_url, timeout=30)
+            download_response = self.session.get(download_url, timeout=30)
 
             logger.debug(
                 f"✅ S3 FILE DOWNLOAD RESPONSE: {download_response.status_code} ({len(download_response.content)} bytes)"
@@ -214,7 +300,7 @@ class RelayClient:
             full_url = f"{download_url_endpoint}?hash={file_hash}"
             logger.debug(f"🌐 DOWNLOAD-URL REQUEST: GET {full_url}")
 
-            response = requests.get(
+            response = self.session.get(
                 download_url_endpoint, params=params, headers=headers, timeout=10
             )
 
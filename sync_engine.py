@@ -6,9 +6,10 @@ import time
 import threading
 import logging
 import traceback
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import List, Dict, Optional, Any, Tuple
-from pycrdt import Map
+from pycrdt import Doc, Map
 from models import (
     SyncOperation,
     SyncType,
@@ -18,12 +19,16 @@ from models import (
     create_document_resource_from_metadata,
 )
 from relay_client import RelayClient
-from persistence import PersistenceManager
+from persistence import PersistenceManager, hash_file
 from s3rn import S3RNType, S3RN, S3RemoteFolder, S3RemoteDocument, S3RemoteFile, S3RemoteCanvas
 
 logger = logging.getLogger(__name__)
 
 
+# Upper bound on folder documents fetched concurrently during a full relay sync
+FOLDER_FETCH_MAX_WORKERS = 8
+
+
 class SyncEngine:
     """Core synchronization logic for Y-Sweet documents to Git repositories"""
 
@@ -37,6 +42,7 @@ class SyncEngine:
         self.relay_client = relay_client
         self.persistence_manager = persistence_manager or PersistenceManager(data_dir)
         self.folder_sync_locks: Dict[str, threading.Lock] = {}
+        self._folder_locks_guard = threading.Lock()  # Serializes lock creation only
 
     def process_document_change(
         self, relay_id: str, resource_id: str, timestamp: datetime
@@ -170,8 +176,13 @@ class SyncEngine:
             logger.error(f"Document change processing traceback: {traceback.format_exc()}")
             return SyncResult(resource=None, operations=[], success=False, error=str(e))
 
-    def process_sync_request(self, request: SyncRequest) -> SyncResult:
-        """Process a sync request using S3RN resource"""
+    def process_sync_request(
+        self, request: SyncRequest, document_structure: Optional[Tuple[Doc, dict]] = None
+    ) -> SyncResult:
+        """Process a sync request using S3RN resource
+
+        document_structure may carry a prefetched get_document_structure() result.
+        """
         try:
             resource = request.resource
             relay_id = S3RN.get_relay_id(resource)
@@ -181,8 +192,10 @@ class SyncEngine:
             # Ensure relay data is loaded
             self.persistence_manager.load_persistent_data(relay_id)
 
-            # Get document structure
-            doc, parsed_content = self.relay_client.get_document_structure(resource)
+            # Get document structure unless it was prefetched
+            if document_structure is None:
+                document_structure = self.relay_client.get_document_structure(resource)
+            doc, parsed_content = document_structure
             print(f"Document {resource} keys: {doc.keys()}")
 
             operations = []
@@ -265,14 +278,19 @@ class SyncEngine:
             logger.error(f"Sync request processing traceback: {traceback.format_exc()}")
             return SyncResult(resource=request.resource, operations=[], success=False, error=str(e))
 
-    def sync_relay_all_folders(self, relay_id: str) -> List[SyncResult]:
-        """CLI/API-triggered sync for all folders in a relay"""
+    def sync_relay_all_folders(
+        self, relay_id: str, executor: Optional[Executor] = None
+    ) -> List[SyncResult]:
+        """CLI/API-triggered sync for all folders in a relay
+
+        Folder documents are fetched on `executor` when given (e.g. a caller-sized pool
+        reused across relays), otherwise on a pool owned by this call.
+        """
         try:
             # Load relay data
             self.persistence_manager.load_persistent_data(relay_id)
             # Note: Git repo initialization is now done per-folder when needed
 
-            results = []
             # Get stored filemeta to know which folders exist
             stored_relay_filemeta = self.persistence_manager.filemeta_folders.get(relay_id, {})
 
@@ -280,23 +298,46 @@ class SyncEngine:
                 print(f"No folders found for relay {relay_id} in stored data")
                 return []
 
-            for folder_uuid, stored_filemeta_dict in stored_relay_filemeta.items():
-                # Use folder UUID directly
-                folder_resource = S3RemoteFolder(relay_id, folder_uuid)
+            # Use folder UUIDs directly
+            folder_resources = [
+                S3RemoteFolder(relay_id, folder_uuid) for folder_uuid in stored_relay_filemeta
+            ]
 
-                # Create sync request that will fetch fresh data from server
-                request = SyncRequest(
-                    resource=folder_resource, timestamp=datetime.now(timezone.utc)
-                )
-                result = self.process_sync_request(request)
-                results.append(result)
+            if executor is not None:
+                return self._sync_folders_prefetched(folder_resources, executor)
 
-            return results
+            max_workers = min(FOLDER_FETCH_MAX_WORKERS, len(folder_resources))
+            with ThreadPoolExecutor(max_workers=max_workers) as own_executor:
+                return self._sync_folders_prefetched(folder_resources, own_executor)
 
         except Exception as e:
             logger.error(f"Error syncing all folders for relay {relay_id}: {e}")
             return [SyncResult(resource=None, operations=[], success=False, error=str(e))]
 
+    def _sync_folders_prefetched(
+        self, folder_resources: List[S3RemoteFolder], executor: Executor
+    ) -> List[SyncResult]:
+        """Sync folders in order while their documents are fetched ahead on executor"""
+        # Fetch folder documents concurrently since that is network-bound, but apply
+        # them one at a time: each sync reloads and rewrites the relay's persisted state
+        results = []
+        structures = executor.map(self._prefetch_document_structure, folder_resources)
+        for folder_resource, structure in zip(folder_resources, structures):
+            # Create sync request using the freshly fetched server data
+            request = SyncRequest(resource=folder_resource, timestamp=datetime.now(timezone.utc))
+            result = self.process_sync_request(request, structure)
+            results.append(result)
+        return results
+
+    def _prefetch_document_structure(self, resource: S3RNType) -> Optional[Tuple[Doc, dict]]:
+        """Fetch a document structure ahead of processing, or None to fetch it again inline"""
+        try:
+            return self.relay_client.get_document_structure(resource)
+        except Exception as e:
+            # process_sync_request retries the fetch and reports the failure for this folder
+            logger.warning(f"Prefetch failed for {resource}: {e}")
+            return None
+
     def sync_specific_folder(self, folder_resource: S3RemoteFolder) -> SyncResult:
         """CLI/API-triggered sync for specific folder"""
         request = SyncRequest(resource=folder_resource, timestamp=datetime.now(timezone.utc))
@@ -336,6 +377,16 @@ class SyncEngine:
             )
             return None
 
+    def _get_folder_lock(self, folder_uuid: str) -> threading.Lock:
+        """Get or create the per-folder sync lock"""
+        # Fast path is a plain dict read; the guard only ensures two threads
+        # racing on a new folder end up sharing one lock
+        lock = self.folder_sync_locks.get(folder_uuid)
+        if lock is None:
+            with self._folder_locks_guard:
+                lock = self.folder_sync_locks.setdefault(folder_uuid, threading.Lock())
+        return lock
+
     def apply_remote_folder_changes(
         self, relay_id: str, folder_resource: S3RemoteFolder, old_filemeta: Dict, new_filemeta: Dict
     ) -> List[SyncOperation]:
@@ -346,11 +397,7 @@ class SyncEngine:
         folder_uuid = S3RN.get_folder_id(folder_resource)
         print(f"Applying remote folder changes for folder {folder_uuid} in relay {relay_id}")
 
-        # Get or create per-folder sync lock
-        if folder_uuid not in self.folder_sync_locks:
-            self.folder_sync_locks[folder_uuid] = threading.Lock()
-
-        folder_lock = self.folder_sync_locks[folder_uuid]
+        folder_lock = self._get_folder_lock(folder_uuid)
 
         # Prevent concurrent syncs for this folder
         with folder_lock:
@@ -537,10 +584,7 @@ class SyncEngine:
 
         # Get local file hash
         try:
-            with open(full_path, "rb") as f:
-                local_content = f.read()
-            local_hash = hashlib.sha256(local_content).hexdigest()
-            return local_hash != remote_hash
+            return hash_file(full_path) != remote_hash
         except Exception as e:
             logger.warning(f"Error reading file {full_path} for hash comparison: {e}")
             return True  # Error reading file, assume update needed
@@ -298,5 +298,87 @@ class TestDocumentationEndpoints:
         assert "http://testserver:8080" in content
 
 
+class TestWebhookEndpoint:
+    """Test the webhook endpoint's handling of the operations queue"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.webhook_processor = Mock(spec=WebhookProcessor)
+        self.webhook_processor.process_webhook.return_value = {
+            "relay_id": "relay",
+            "resource_id": "doc",
+            "timestamp": "2024-01-01T00:00:00Z",
+        }
+        self.operations_queue = Mock(spec=OperationsQueue)
+        self.webhook_secret = "test_secret"
+        self.persistence_manager = Mock(spec=PersistenceManager)
+
+    def _post_webhook(self):
+        server = StarletteWebServer(
+            self.webhook_processor,
+            self.operations_queue,
+            self.webhook_secret,
+            self.persistence_manager,
+        )
+        client = TestClient(server.app)
+        return client.post(
+            "/webhooks",
+            content=b'{"payload": {"doc_id": "doc"}}',
+            headers={"Authorization": f"Bearer {self.webhook_secret}"},
+        )
+
+    def test_webhook_enqueued(self):
+        """Test webhook is accepted when the queue has room"""
+        self.operations_queue.enqueue_document_change.return_value = True
+
+        response = self._post_webhook()
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "received"}
+        self.operations_queue.enqueue_document_change.assert_called_once()
+
+    def test_webhook_queue_full(self):
+        """Test webhook is refused with 503 when the queue is full"""
+        self.operations_queue.enqueue_document_change.return_value = False
+
+        response = self._post_webhook()
+
+        assert response.status_code == 503
+        assert response.json() == {"error": "Operations queue full"}
+
+
+class TestDefaultReject:
+    """Test requests that match no route are rejected like unauthenticated ones"""
+
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.webhook_processor = Mock(spec=WebhookProcessor)
+        self.operations_queue = Mock(spec=OperationsQueue)
+        self.webhook_secret = "test_secret"
+        self.persistence_manager = Mock(spec=PersistenceManager)
+        server = StarletteWebServer(
+            self.webhook_processor,
+            self.operations_queue,
+            self.webhook_secret,
+            self.persistence_manager,
+        )
+        self.client = TestClient(server.app)
+
+    def test_unknown_route_returns_401(self):
+        """Test an unknown path gets the default reject instead of 404"""
+        response = self.client.get("/does-not-exist")
+
+        assert response.status_code == 401
+        assert response.json() == {
+            "error": "Endpoint requires explicit authentication configuration"
+        }
+
+    def test_unsupported_method_returns_401(self):
+        """Test a known path with the wrong method gets the default reject instead of 405"""
+        response = self.client.post("/health")
+
+        assert response.status_code == 401
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
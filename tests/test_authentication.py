@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
+import base64
 import json
+import pytest
 from starlette.testclient import TestClient
 from starlette.applications import Starlette
 from starlette.routing import Route
@@ -318,6 +320,138 @@ def test_flexible_authentication():
     print("✅ Flexible authentication tests passed!")
 
 
+def test_svix_signature_authentication():
+    """Test Svix HMAC signatures produced by the Svix SDK are accepted"""
+
+    print("\nTesting Svix Signature Authentication")
+    print("=" * 40)
+
+    from datetime import datetime, timezone
+    from svix.webhooks import Webhook
+
+    webhook_secret = "whsec_" + base64.b64encode(b"svix-test-signing-key-0123456789").decode()
+
+    @webhook_auth
+    async def webhook_handler(request: Request):
+        body = await request.json()
+        user = getattr(request.state, "user", None)
+        return JSONResponse({"body": body, "user": user})
+
+    app = Starlette(
+        routes=[Route("/webhooks", webhook_handler, methods=["POST"])],
+        middleware=[
+            Middleware(AuthMiddleware, webhook_secret=webhook_secret),
+            Middleware(DefaultRejectMiddleware),
+        ],
+    )
+    client = TestClient(app)
+
+    body = json.dumps({"payload": {"doc_id": "abc"}})
+    now = datetime.now(tz=timezone.utc)
+    signature = Webhook(webhook_secret).sign("msg_1", now, body)
+    headers = {
+        "svix-id": "msg_1",
+        "svix-timestamp": str(int(now.timestamp())),
+        "svix-signature": f"v1,invalid {signature}",
+        "content-type": "application/json",
+    }
+
+    # Valid signature (alongside an invalid one) is accepted and body reaches handler
+    response = client.post("/webhooks", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["body"] == {"payload": {"doc_id": "abc"}}
+    assert response.json()["user"]["auth_type"] == "svix"
+
+    # webhook- prefixed headers are accepted as well
+    webhook_headers = {k.replace("svix-", "webhook-"): v for k, v in headers.items()}
+    response = client.post("/webhooks", content=body, headers=webhook_headers)
+    assert response.status_code == 200
+
+    # Tampered body is rejected
+    response = client.post("/webhooks", content=body.replace("abc", "xyz"), headers=headers)
+    assert response.status_code == 401
+
+    # Stale timestamp is rejected
+    stale_headers = dict(headers, **{"svix-timestamp": str(int(now.timestamp()) - 3600)})
+    response = client.post("/webhooks", content=body, headers=stale_headers)
+    assert response.status_code == 401
+
+    print("✅ Svix signature authentication tests passed!")
+
+
+def test_noauth_endpoint_skips_auth_extraction():
+    """Test that @noauth endpoints bypass signature validation entirely"""
+
+    from unittest.mock import AsyncMock, patch
+
+    webhook_secret = "whsec_" + base64.b64encode(b"svix-test-signing-key-0123456789").decode()
+
+    @noauth
+    async def health(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    @webhook_auth
+    async def webhook_handler(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    app = Starlette(
+        routes=[
+            Route("/health", health, methods=["GET"]),
+            Route("/webhooks", webhook_handler, methods=["POST"]),
+        ],
+        middleware=[
+            Middleware(AuthMiddleware, webhook_secret=webhook_secret),
+            Middleware(DefaultRejectMiddleware),
+        ],
+    )
+    client = TestClient(app)
+
+    with patch.object(
+        AuthMiddleware, "_validate_svix_signature", new_callable=AsyncMock
+    ) as validate:
+        response = client.get("/health")
+        assert response.status_code == 200
+        validate.assert_not_called()
+
+        response = client.post("/webhooks", content=b"{}")
+        assert response.status_code == 401
+        validate.assert_called_once()
+
+
+def test_route_auth_validation():
+    """Test that unmarked endpoints are rejected at route registration time"""
+
+    from auth_middleware import validate_route_auth
+
+    @noauth
+    async def public_endpoint(request: Request):
+        return JSONResponse({})
+
+    @webhook_auth
+    async def webhook_endpoint(request: Request):
+        return JSONResponse({})
+
+    async def unprotected_endpoint(request: Request):
+        return JSONResponse({})
+
+    # Marked endpoints pass validation
+    validate_route_auth(
+        [
+            Route("/public", public_endpoint, methods=["GET"]),
+            Route("/webhooks", webhook_endpoint, methods=["POST"]),
+        ]
+    )
+
+    # Unmarked endpoints are refused up front
+    with pytest.raises(ValueError, match="/unprotected"):
+        validate_route_auth(
+            [
+                Route("/public", public_endpoint, methods=["GET"]),
+                Route("/unprotected", unprotected_endpoint, methods=["GET"]),
+            ]
+        )
+
+
 def test_web_server_integration():
     """Integration test with actual web server components"""
 
@@ -354,4 +488,5 @@ if __name__ == "__main__":
     test_secret_generation()
     test_api_token_generation_and_validation()
     test_flexible_authentication()
+    test_svix_signature_authentication()
     test_web_server_integration()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import stat
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+from cli import (
+    build_parser,
+    get_parser,
+    is_uuid,
+    load_public_key,
+    pubkey_cache_path,
+    run,
+)
+
+
+class TestUuidValidation:
+    """Test relay/folder ID validation"""
+
+    def test_canonical_uuid_accepted(self):
+        assert is_uuid("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
+        assert is_uuid("6BA7B810-9DAD-11D1-80B4-00C04FD430C8")
+
+    def test_malformed_ids_rejected(self):
+        assert not is_uuid("a--b-c-d-e")
+        assert not is_uuid("6ba7b8109dad11d180b400c04fd430c8")
+        assert not is_uuid("{6ba7b810-9dad-11d1-80b4-00c04fd430c8}")
+        assert not is_uuid("")
+        assert not is_uuid(None)
+
+
+class TestRun:
+    """Test running the CLI in-process"""
+
+    def test_invalid_relay_id_rejected(self, capsys):
+        argv = ["sync", "--relay-id", "a--b-c-d-e", "--relay-server-url", "http://relay"]
+
+        assert run(argv) == 1
+        assert "Invalid relay ID format" in capsys.readouterr().out
+
+    @patch("sync_engine.SyncEngine")
+    @patch("persistence.PersistenceManager")
+    @patch("relay_client.RelayClient")
+    def test_sync_without_operations_skips_commit(
+        self, mock_client, mock_persistence, mock_engine, tmp_path, capsys
+    ):
+        mock_engine.return_value.sync_specific_folder.return_value = MagicMock(
+            success=True, operations=[]
+        )
+        mock_persistence.return_value.shutdown_requested = False
+        argv = [
+            "--data-dir",
+            str(tmp_path),
+            "sync",
+            "--relay-id",
+            "6ba7b810-9dad-11d1-80b4-00c04fd430c8",
+            "--folder-id",
+            "f47ac10b-58cc-4372-a567-0e02b2c3d479",
+            "--relay-server-url",
+            "http://relay",
+        ]
+
+        assert run(argv) == 0
+        mock_persistence.return_value.commit_changes.assert_not_called()
+        assert "No changes to commit" in capsys.readouterr().out
+
+    @patch("sync_engine.SyncEngine")
+    @patch("persistence.PersistenceManager")
+    @patch("relay_client.RelayClient")
+    def test_interrupted_sync_skips_commit(
+        self, mock_client, mock_persistence, mock_engine, tmp_path, capsys
+    ):
+        mock_engine.return_value.sync_specific_folder.return_value = MagicMock(
+            success=True, operations=[MagicMock()]
+        )
+        mock_persistence.return_value.shutdown_requested = True
+        argv = [
+            "--data-dir",
+            str(tmp_path),
+            "sync",
+            "--relay-id",
+            "6ba7b810-9dad-11d1-80b4-00c04fd430c8",
+            "--folder-id",
+            "f47ac10b-58cc-4372-a567-0e02b2c3d479",
+            "--relay-server-url",
+            "http://relay",
+        ]
+
+        assert run(argv) == 1
+        mock_persistence.return_value.commit_changes.assert_not_called()
+        mock_persistence.return_value.shutdown.assert_called_once()
+
+    @patch("persistence.PersistenceManager")
+    def test_git_sync_shuts_down_persistence(self, mock_persistence, tmp_path):
+        mock_persistence.return_value._initialize_git_repos_from_toml.return_value = 0
+
+        assert run(["--data-dir", str(tmp_path), "git", "sync"]) == 0
+        mock_persistence.return_value.shutdown.assert_called_once()
+
+    def test_json_output(self, capsys, monkeypatch):
+        monkeypatch.setenv("JWT_SECRET", "sk_test_secret")
+
+        assert run(["--json", "api", "token", "create", "--expires", "2"]) == 0
+        output = json.loads(capsys.readouterr().out)
+        assert output["ok"] is True
+        assert output["expires_in_days"] == 2
+        assert output["token"].count(".") == 2
+
+    def test_missing_subcommand_prints_group_help(self, capsys):
+        assert run(["api", "token"]) == 1
+        assert "api token [-h] {create}" in capsys.readouterr().out
+
+    def test_parser_reused_across_runs(self):
+        get_parser.cache_clear()
+
+        run(["git"])
+        run(["git"])
+
+        assert get_parser.cache_info().misses == 1
+        assert get_parser.cache_info().hits == 1
+
+
+class TestBuildParser:
+    """Test lazy construction of the subcommand trees"""
+
+    def test_only_requested_groups_are_built(self):
+        parser = build_parser(frozenset({"git"}), env={})
+
+        args = parser.parse_args(["git", "list"])
+        assert args.func.__name__ == "git_connector_list_command"
+
+        # Unrequested groups are registered by name but have no subcommands
+        args = parser.parse_args(["api"])
+        assert not hasattr(args, "func")
+        assert not hasattr(args, "help_parser")
+
+    def test_full_build_uses_env_defaults(self):
+        parser = build_parser(
+            env={"RELAY_SERVER_URL": "http://relay", "RELAY_GIT_DATA_DIR": "/data"}
+        )
+
+        args = parser.parse_args(["sync", "--relay-id", "6ba7b810-9dad-11d1-80b4-00c04fd430c8"])
+        assert args.relay_server_url == "http://relay"
+        assert args.data_dir == "/data"
+
+
+class TestPublicKeyCache:
+    """Test caching of the public key derived from SSH_PRIVATE_KEY"""
+
+    def test_public_key_cached_per_private_key(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        monkeypatch.setenv("SSH_PRIVATE_KEY", "fake-private-key")
+
+        with patch("persistence.SSHKeyManager") as mock_manager:
+            mock_manager.return_value.get_public_key.return_value = "ssh-ed25519 AAAA test"
+
+            assert load_public_key() == "ssh-ed25519 AAAA test"
+            assert load_public_key() == "ssh-ed25519 AAAA test"
+
+        # Second call is served from the cache file
+        assert mock_manager.call_count == 1
+        cache_path = pubkey_cache_path("fake-private-key")
+        assert cache_path.startswith(str(tmp_path))
+        assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+
+        # A different private key never reuses the cached entry
+        assert pubkey_cache_path("other-private-key") != cache_path
+
+
+class TestImportIsolation:
+    """Keygen/token commands must not pull in git, relay or persistence modules"""
+
+    def test_secret_commands_skip_heavy_imports(self):
+        script = (
+            "import sys, cli\n"
+            "cli.run(['webhook', 'keygen'])\n"
+            "cli.run(['api', 'keygen'])\n"
+            "cli.run(['api', 'token', 'create', '--name', 'ci'])\n"
+            "heavy = {'git', 'jwt', 'persistence', 'relay_client', 'sync_engine', 'git_config'}\n"
+            "leaked = sorted(heavy & sys.modules.keys())\n"
+            "sys.exit(f'imported: {leaked}' if leaked else 0)\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        proc = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=root,
+            env={**os.environ, "JWT_SECRET": "sk_test_secret"},
+            capture_output=True,
+            text=True,
+        )
+
+        assert proc.returncode == 0, proc.stderr
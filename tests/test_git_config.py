@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+from unittest.mock import patch
+import git_config
+from git_config import GitConnector, GitConnectorConfig
+
+RELAY_ID = "6ba7b810-9dad-11d1-80b4-00c04fd430c8"
+FOLDER_ID = "f47ac10b-58cc-4372-a567-0e02b2c3d479"
+
+CONNECTOR_TOML = f"""
+[[git_connector]]
+shared_folder_id = "{FOLDER_ID}"
+relay_id = "{RELAY_ID}"
+url = "{{url}}"
+"""
+
+
+class TestConfigParseCache:
+    """Test reuse of parsed TOML across GitConnectorConfig loads"""
+
+    def count_parses(self):
+        return patch.object(git_config.tomllib, "load", wraps=git_config.tomllib.load)
+
+    def write_config(self, path, url, mtime_ns=None):
+        path.write_text(CONNECTOR_TOML.format(url=url))
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_unchanged_file_is_not_reparsed(self, tmp_path):
+        config_file = tmp_path / "git_connectors.toml"
+        self.write_config(config_file, "https://example.com/a.git")
+
+        with self.count_parses() as mock_load:
+            first = GitConnectorConfig(str(config_file))
+            second = GitConnectorConfig(str(config_file))
+            second.reload_config()
+
+        assert mock_load.call_count == 1
+        assert second.connectors == first.connectors
+        # Each instance owns its list, so edits stay local
+        assert second.connectors is not first.connectors
+
+    def test_connector_edits_do_not_leak_through_cache(self, tmp_path):
+        config_file = tmp_path / "git_connectors.toml"
+        self.write_config(config_file, "https://example.com/a.git")
+
+        first = GitConnectorConfig(str(config_file))
+        first.connectors[0].url = "https://example.com/edited.git"
+        second = GitConnectorConfig(str(config_file))
+
+        assert second.connectors[0] is not first.connectors[0]
+        assert second.connectors[0].url == "https://example.com/a.git"
+
+    def test_modified_file_is_reparsed(self, tmp_path):
+        config_file = tmp_path / "git_connectors.toml"
+        self.write_config(config_file, "https://example.com/a.git", mtime_ns=1_000_000_000)
+        config = GitConnectorConfig(str(config_file))
+
+        self.write_config(config_file, "https://example.com/b.git", mtime_ns=2_000_000_000)
+        config.reload_config()
+
+        assert config.connectors[0].url == "https://example.com/b.git"
+
+    def test_invalidate_forces_reparse(self, tmp_path):
+        config_file = tmp_path / "git_connectors.toml"
+        self.write_config(config_file, "https://example.com/a.git")
+        config = GitConnectorConfig(str(config_file))
+
+        with self.count_parses() as mock_load:
+            config.invalidate()
+            config.reload_config()
+
+        assert mock_load.call_count == 1
+
+    def test_example_config_is_not_shadowed_by_cache(self, tmp_path):
+        config_file = tmp_path / "git_connectors.toml"
+        config = GitConnectorConfig(str(config_file))
+        git_config._PARSE_CACHE[config.get_config_file_path()] = (0, 0, ())
+
+        assert config.create_example_config()
+        assert config.get_config_file_path() not in git_config._PARSE_CACHE
+
+        config.reload_config()
+        assert config.connectors[0].relay_id == RELAY_ID
+
+
+class TestConnectorIndex:
+    """Test keyed lookups stay consistent with the connector list"""
+
+    OTHER_FOLDER_ID = "0b8f5a3e-5f1c-4b59-9d0e-8c2a1c7e9f11"
+
+    def setup_method(self):
+        self.config = GitConnectorConfig("/nonexistent/git_connectors.toml")
+
+    def make_connector(self, folder_id=FOLDER_ID, url="https://example.com/a.git"):
+        return GitConnector(shared_folder_id=folder_id, relay_id=RELAY_ID, url=url)
+
+    def test_add_and_lookup(self):
+        first = self.make_connector()
+        second = self.make_connector(folder_id=self.OTHER_FOLDER_ID)
+        self.config.add_connector(first)
+        self.config.add_connector(second)
+
+        assert self.config.get_connector_for_folder(RELAY_ID, FOLDER_ID) is first
+        assert self.config.get_connectors_for_relay(RELAY_ID) == (first, second)
+        assert self.config.get_connector_for_folder(RELAY_ID, "missing") is None
+
+    def test_add_replaces_existing_connector(self):
+        self.config.add_connector(self.make_connector())
+        replacement = self.make_connector(url="https://example.com/b.git")
+        self.config.add_connector(replacement)
+
+        assert self.config.connectors == [replacement]
+        assert self.config.get_connector_for_folder(RELAY_ID, FOLDER_ID) is replacement
+
+    def test_remove_connector(self):
+        self.config.add_connector(self.make_connector())
+
+        assert self.config.remove_connector(RELAY_ID, FOLDER_ID)
+        assert not self.config.remove_connector(RELAY_ID, FOLDER_ID)
+        assert self.config.connectors == []
+        assert self.config.get_connector_for_folder(RELAY_ID, FOLDER_ID) is None
+        assert self.config.get_connectors_for_relay(RELAY_ID) == ()
+
+    def test_duplicates_resolve_to_first_entry(self):
+        first = self.make_connector()
+        duplicate = self.make_connector(url="https://example.com/b.git")
+        self.config.connectors = [first, duplicate]
+
+        assert self.config.get_connector_for_folder(RELAY_ID, FOLDER_ID) is first
+        # Duplicates are still visible to validation
+        assert any("Duplicate" in error for error in self.config.validate_config())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,6 +3,7 @@
 import datetime
 import jwt
 import pytest
+from unittest.mock import patch
 from cli import create_jwt_token
 from jwt_auth import JWTValidator
 
@@ -84,6 +85,74 @@ class TestJWTValidation:
         assert not is_valid
         assert "scope" in error_msg.lower()
 
+    def test_cached_validation_returns_independent_payloads(self):
+        token = create_jwt_token(self.secret, "api", expires_in_days=1, name="cached")
+
+        first = self.validator.validate_api_token(token)
+        second = self.validator.validate_api_token(token)
+
+        assert first[0] and second[0]
+        assert second[1] == first[1]
+        # Cached payloads are copied so callers cannot mutate each other's view
+        second[1]["name"] = "mutated"
+        assert self.validator.validate_api_token(token)[1]["name"] == "cached"
+
+    def test_cached_validation_respects_token_expiry(self):
+        payload = {
+            "iat": datetime.datetime.utcnow(),
+            "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+            "scope": "api",
+            "aud": "api-endpoint",
+        }
+        token = jwt.encode(payload, self.secret[3:], algorithm="HS256")
+        assert self.validator.validate_api_token(token)[0]
+
+        # Simulate the cached entry reaching the token's expiry
+        for key, (_, cached_payload) in self.validator._token_cache.items():
+            self.validator._token_cache[key] = (0, cached_payload)
+
+        # Falls through to full validation, which still succeeds for a live token
+        is_valid, result, error = self.validator.validate_api_token(token)
+        assert is_valid
+        assert error is None
+
+    @patch("jwt_auth.TOKEN_CACHE_MAX_ENTRIES", 2)
+    def test_cache_evicts_least_recently_used_token(self):
+        tokens = [
+            create_jwt_token(self.secret, "api", expires_in_days=1, name=name)
+            for name in ("first", "second", "third")
+        ]
+        self.validator.validate_api_token(tokens[0])
+        self.validator.validate_api_token(tokens[1])
+        # Touch the first token so the second becomes least recently used
+        self.validator.validate_api_token(tokens[0])
+
+        with patch.object(self.validator, "_decoder", wraps=self.validator._decoder) as decoder:
+            self.validator.validate_api_token(tokens[2])
+            self.validator.validate_api_token(tokens[0])
+            assert decoder.decode.call_count == 1
+
+            self.validator.validate_api_token(tokens[1])
+            assert decoder.decode.call_count == 2
+
+    def test_malformed_tokens_rejected_before_decoding(self):
+        token = create_jwt_token(self.secret, "api", expires_in_days=1)
+
+        with patch.object(self.validator, "_decoder") as decoder:
+            for bad_token in ("not-a-jwt", token + ".extra", token + "A" * 8192):
+                is_valid, result, error_msg = self.validator.validate_api_token(bad_token)
+                assert not is_valid
+                assert error_msg == "Invalid token"
+
+        decoder.decode.assert_not_called()
+
+    def test_created_token_matches_pyjwt_encoding(self):
+        token = create_jwt_token(self.secret, "api", expires_in_days=2, name="deploy")
+
+        payload = jwt.decode(token, self.secret[3:], algorithms=["HS256"], audience="api-endpoint")
+        assert payload["exp"] - payload["iat"] == 2 * 24 * 60 * 60
+        assert token == jwt.encode(payload, self.secret[3:], algorithm="HS256")
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from operations_queue import OperationsQueue
+from models import SyncResult
+
+
+def make_change(resource_id="doc-1"):
+    return {"relay_id": "relay-1", "resource_id": resource_id, "timestamp": "now"}
+
+
+class TestWaitForEmptyQueue:
+    """Test waiting for queued work to finish"""
+
+    def setup_method(self):
+        self.release = threading.Event()
+        self.sync_engine = MagicMock()
+
+        def process_document_change(relay_id, resource_id, timestamp):
+            self.release.wait(5)
+            return SyncResult(resource=None, operations=[], success=True)
+
+        self.sync_engine.process_document_change.side_effect = process_document_change
+        self.queue = OperationsQueue(self.sync_engine, commit_interval=3600)
+
+    def teardown_method(self):
+        self.release.set()
+        self.queue.stop(timeout=5)
+
+    def test_times_out_while_request_in_progress(self):
+        assert self.queue.enqueue_document_change(make_change())
+
+        assert not self.queue.wait_for_empty_queue(timeout=0.05)
+
+    def test_returns_once_requests_are_processed(self):
+        assert self.queue.enqueue_document_change(make_change())
+
+        self.release.set()
+
+        assert self.queue.wait_for_empty_queue(timeout=5)
+        self.sync_engine.process_document_change.assert_called_once_with("relay-1", "doc-1", "now")
+
+    def test_failed_and_unknown_requests_are_marked_done(self):
+        self.release.set()
+        self.sync_engine.process_document_change.side_effect = RuntimeError("boom")
+
+        assert self.queue.enqueue_document_change(make_change())
+        assert self.queue._try_put(object())
+
+        assert self.queue.wait_for_empty_queue(timeout=5)
+
+
+class TestRequestCoalescing:
+    """Test folding repeated requests for a resource that is still queued"""
+
+    def setup_method(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.sync_engine = MagicMock()
+
+        def process_document_change(relay_id, resource_id, timestamp):
+            self.started.set()
+            self.release.wait(5)
+            return SyncResult(resource=None, operations=[], success=True)
+
+        self.sync_engine.process_document_change.side_effect = process_document_change
+        self.queue = OperationsQueue(self.sync_engine, commit_interval=3600)
+
+    def teardown_method(self):
+        self.release.set()
+        self.queue.stop(timeout=5)
+
+    def test_duplicate_pending_changes_are_coalesced(self):
+        assert self.queue.enqueue_document_change(make_change("doc-1"))
+        assert self.started.wait(5)
+
+        # doc-1 is in progress, so a new change to it still queues; doc-2 queues once
+        assert self.queue.enqueue_document_change(make_change("doc-2"))
+        assert self.queue.enqueue_document_change(make_change("doc-2"))
+        assert self.queue.enqueue_document_change(make_change("doc-1"))
+        assert self.queue.get_queue_size() == 2
+
+        self.release.set()
+        assert self.queue.wait_for_empty_queue(timeout=5)
+
+        processed = [c.args[1] for c in self.sync_engine.process_document_change.call_args_list]
+        assert processed == ["doc-1", "doc-2", "doc-1"]
+
+    def test_coalesced_change_takes_newest_payload(self):
+        assert self.queue.enqueue_document_change(make_change("doc-1"))
+        assert self.started.wait(5)
+
+        assert self.queue.enqueue_document_change(make_change("doc-2"))
+        newer = dict(make_change("doc-2"), timestamp="later")
+        assert self.queue.enqueue_document_change(newer)
+
+        self.release.set()
+        assert self.queue.wait_for_empty_queue(timeout=5)
+
+        self.sync_engine.process_document_change.assert_called_with("relay-1", "doc-2", "later")
+        assert self.sync_engine.process_document_change.call_count == 2
+
+
+class TestCommitTimer:
+    """Test the periodic commit of processed changes"""
+
+    def setup_method(self):
+        self.sync_engine = MagicMock()
+        self.queue = OperationsQueue(self.sync_engine, commit_interval=3600)
+        self.state = self.queue.get_sync_state()
+
+    def teardown_method(self):
+        self.queue.stop(timeout=5)
+
+    def test_operations_completed_during_commit_are_kept(self):
+        committed_op = MagicMock(completed=True)
+        late_op = MagicMock(completed=True)
+        self.state.completed_operations.append(committed_op)
+        self.state.has_changes = True
+
+        def commit_changes():
+            # A worker finishes more work while the commit is running
+            self.state.completed_operations.append(late_op)
+            self.state.has_changes = True
+            return True
+
+        self.sync_engine.persistence_manager.commit_changes.side_effect = commit_changes
+
+        self.queue._maybe_commit_changes()
+
+        assert list(self.state.completed_operations) == [late_op]
+        assert self.state.has_changes
+
+    def test_failed_commit_keeps_changes_pending(self):
+        op = MagicMock(completed=True)
+        self.state.completed_operations.append(op)
+        self.state.has_changes = True
+        self.sync_engine.persistence_manager.commit_changes.return_value = False
+
+        self.queue._maybe_commit_changes()
+
+        assert list(self.state.completed_operations) == [op]
+        assert self.state.has_changes
+
+
+class TestStop:
+    """Test shutting down the worker thread"""
+
+    def test_stop_drains_queued_requests_then_exits(self):
+        sync_engine = MagicMock()
+        sync_engine.process_document_change.return_value = SyncResult(
+            resource=None, operations=[], success=True
+        )
+        operations_queue = OperationsQueue(sync_engine, commit_interval=3600)
+        operations_queue.enqueue_document_change(make_change("doc-1"))
+        operations_queue.enqueue_document_change(make_change("doc-2"))
+
+        assert operations_queue.stop(timeout=5)
+        assert sync_engine.process_document_change.call_count == 2
+        assert operations_queue.get_queue_size() == 0
+
+    def test_stop_honours_timeout_when_queue_is_full(self):
+        started = threading.Event()
+        release = threading.Event()
+        sync_engine = MagicMock()
+
+        def process_document_change(relay_id, resource_id, timestamp):
+            started.set()
+            release.wait(5)
+            return SyncResult(resource=None, operations=[], success=True)
+
+        sync_engine.process_document_change.side_effect = process_document_change
+        operations_queue = OperationsQueue(sync_engine, commit_interval=3600, max_queue_size=1)
+        assert operations_queue.enqueue_document_change(make_change("doc-1"))
+        assert started.wait(5)
+        assert operations_queue.enqueue_document_change(make_change("doc-2"))
+
+        # No room for the wake-up item, so stop() gives up after its timeout
+        started_at = time.monotonic()
+        assert not operations_queue.stop(timeout=0.1)
+        assert time.monotonic() - started_at < 2
+
+        # The worker still drains what was queued and then exits
+        release.set()
+        operations_queue.worker_thread.join(5)
+        assert not operations_queue.worker_thread.is_alive()
+        assert sync_engine.process_document_change.call_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
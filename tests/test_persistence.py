@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 
 import os
+import hashlib
+import mmap
 import tempfile
 import shutil
 import json
+import signal
 import pytest
 import git
-from unittest.mock import patch, MagicMock, mock_open
-from persistence import PersistenceManager, SSHKeyManager
+from unittest.mock import patch, MagicMock, PropertyMock, mock_open
+from persistence import PersistenceManager, SSHKeyManager, hash_file
 from s3rn import S3RemoteFolder, S3RemoteDocument, S3RemoteCanvas, S3RemoteFile
 
 
@@ -69,6 +72,14 @@ class TestPathSanitization:
         with pytest.raises(ValueError, match="Empty path provided"):
             self.persistence._sanitize_path(None, self.base_dir)
 
+    def test_sanitize_path_relative_base_resolved(self):
+        """Test a relative base directory resolves the same as os.path.abspath"""
+        base = os.path.relpath(self.base_dir)
+
+        result = self.persistence._sanitize_path("folder/./file.txt", base)
+
+        assert result == os.path.abspath(os.path.join(base, "folder", "file.txt"))
+
     def test_sanitize_path_base_directory_escape_blocked(self):
         """Test attempts to reference base directory itself are blocked"""
         with pytest.raises(ValueError, match="attempts to escape"):
@@ -482,6 +493,227 @@ class TestPersistentDataManagement:
         assert self.persistence.filemeta_folders[self.relay_id] == {}
         assert self.persistence.local_file_state[self.relay_id] == {}
 
+    def test_corrupt_file_resets_only_that_store(self):
+        """Test an unreadable state file resets its own data and nothing else"""
+        self.persistence.document_hashes[self.relay_id] = {"doc-123": "hash123"}
+        self.persistence.save_persistent_data(self.relay_id)
+        with open(self.persistence.get_filemeta_file_path(self.relay_id), "w") as f:
+            f.write("{truncated")
+
+        self.persistence.load_persistent_data(self.relay_id)
+
+        assert self.persistence.document_hashes[self.relay_id] == {"doc-123": "hash123"}
+        assert self.persistence.filemeta_folders[self.relay_id] == {}
+
+    def test_failed_save_keeps_previous_file(self):
+        """Test a save that fails mid-write leaves the last good file in place"""
+        self.persistence.document_hashes[self.relay_id] = {"doc-123": "hash123"}
+        self.persistence.save_persistent_data(self.relay_id)
+
+        self.persistence.document_hashes[self.relay_id] = {"doc-123": object()}
+        self.persistence.save_persistent_data(self.relay_id)
+
+        with open(self.persistence.get_hashes_file_path(self.relay_id)) as f:
+            assert json.load(f) == {"doc-123": "hash123"}
+        # No temporary files are left behind
+        state_files = os.listdir(self.persistence.get_state_dir(self.relay_id))
+        assert not [name for name in state_files if ".tmp-" in name]
+
+    def test_unchanged_state_is_not_rewritten(self):
+        """Test saving only rewrites files whose contents changed"""
+        self.persistence.document_hashes[self.relay_id] = {"doc-123": "hash123"}
+        self.persistence.save_persistent_data(self.relay_id)
+
+        with patch("persistence.os.replace", wraps=os.replace) as mock_replace:
+            self.persistence.save_persistent_data(self.relay_id)
+            assert mock_replace.call_count == 0
+
+            self.persistence.document_hashes[self.relay_id]["doc-456"] = "hash456"
+            self.persistence.save_persistent_data(self.relay_id)
+            assert mock_replace.call_count == 1
+
+        # State loaded from disk counts as already written
+        reloaded = PersistenceManager(self.temp_dir)
+        with patch("persistence.os.replace") as mock_replace:
+            reloaded.save_persistent_data(self.relay_id)
+            mock_replace.assert_not_called()
+
+    def test_startup_loads_state_for_every_relay(self):
+        """Test all relay state directories are loaded on startup"""
+        relay_ids = [f"relay-{n}" for n in range(3)]
+        for relay_id in relay_ids:
+            self.persistence.document_hashes[relay_id] = {"doc": relay_id}
+            self.persistence.save_persistent_data(relay_id)
+
+        reloaded = PersistenceManager(self.temp_dir)
+
+        for relay_id in relay_ids:
+            assert reloaded.document_hashes[relay_id] == {"doc": relay_id}
+
+    def test_toml_connectors_save_relay_state_once(self):
+        """Test connectors sharing a relay create their folder state in one save"""
+        relay_id = "6ba7b810-9dad-11d1-80b4-00c04fd430c8"
+        folder_ids = {
+            "f47ac10b-58cc-4372-a567-0e02b2c3d479",
+            "0b8f5a3e-5f1c-4b59-9d0e-8c2a1c7e9f11",
+        }
+        config_file = os.path.join(self.temp_dir, "git_connectors.toml")
+        with open(config_file, "w") as f:
+            for folder_id in sorted(folder_ids):
+                f.write(
+                    "[[git_connector]]\n"
+                    f'shared_folder_id = "{folder_id}"\n'
+                    f'relay_id = "{relay_id}"\n'
+                    'url = "/nonexistent/remote.git"\n'
+                )
+
+        with patch.object(
+            PersistenceManager,
+            "save_persistent_data",
+            autospec=True,
+            side_effect=PersistenceManager.save_persistent_data,
+        ) as mock_save:
+            persistence = PersistenceManager(self.temp_dir, config_file)
+
+        mock_save.assert_called_once_with(persistence, relay_id)
+        with open(persistence.get_filemeta_file_path(relay_id)) as f:
+            assert set(json.load(f)) == folder_ids
+
+    def test_startup_initializes_repo_for_every_folder(self):
+        """Test a git repository is opened for each folder with saved state"""
+        self.persistence.filemeta_folders[self.relay_id] = {"folder-a": {}, "folder-b": {}}
+        self.persistence.save_persistent_data(self.relay_id)
+
+        reloaded = PersistenceManager(self.temp_dir)
+
+        assert set(reloaded.git_repos) == {
+            f"{self.relay_id}/folder-a",
+            f"{self.relay_id}/folder-b",
+        }
+
+
+class TestHashFile:
+    """Test file hashing used for remote hash comparison"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_small_and_empty_files(self):
+        """Test files below the mmap threshold hash like hashlib.sha256"""
+        for name, content in (("empty.bin", b""), ("small.md", b"# notes\n")):
+            path = self.write(name, content)
+            assert hash_file(path) == hashlib.sha256(content).hexdigest()
+
+    @patch("persistence.MMAP_THRESHOLD", 16)
+    def test_large_file_hashed_through_mmap(self):
+        """Test files at or above the threshold produce the same digest via mmap"""
+        content = os.urandom(4096)
+        path = self.write("large.bin", content)
+
+        with patch("persistence.mmap.mmap", wraps=mmap.mmap) as mock_mmap:
+            assert hash_file(path) == hashlib.sha256(content).hexdigest()
+        mock_mmap.assert_called_once()
+
+
+class TestGitLockCleanup:
+    """Test removal of stale git lock files"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.persistence = PersistenceManager(self.temp_dir)
+        self.repo_dir = self.persistence.get_folder_path("relay", "folder")
+        self.git_dir = os.path.join(self.repo_dir, ".git")
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def touch(self, *parts):
+        path = os.path.join(*parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+        return path
+
+    def test_removes_git_lock_files_only(self):
+        """Test lock files inside .git are removed while working tree files are kept"""
+        stale = [
+            self.touch(self.git_dir, "index.lock"),
+            self.touch(self.git_dir, "HEAD.lock"),
+            self.touch(self.git_dir, "refs", "heads", "main.lock"),
+            self.touch(self.git_dir, "refs", "remotes", "origin", "main.lock"),
+        ]
+        kept = [
+            self.touch(self.git_dir, "refs", "heads", "main"),
+            self.touch(self.repo_dir, "notes", "meeting.lock"),
+        ]
+
+        self.persistence._cleanup_git_lock_files()
+
+        assert not any(os.path.exists(path) for path in stale)
+        assert all(os.path.exists(path) for path in kept)
+
+    def test_cleanup_scoped_to_repository(self):
+        """Test cleanup for one repo_key leaves other repositories alone"""
+        other_lock = self.touch(
+            self.persistence.get_folder_path("relay", "other"), ".git", "index.lock"
+        )
+        own_lock = self.touch(self.git_dir, "index.lock")
+
+        self.persistence._cleanup_git_lock_files("relay/folder")
+
+        assert not os.path.exists(own_lock)
+        assert os.path.exists(other_lock)
+
+    def test_shutdown_cleanup_skips_busy_repositories(self):
+        """Test shutdown leaves lock files of a repository with a git operation in flight"""
+        idle_lock = self.touch(
+            self.persistence.get_folder_path("relay", "other"), ".git", "index.lock"
+        )
+        busy_lock = self.touch(self.git_dir, "index.lock")
+        self.persistence.git_repos = {"relay/folder": MagicMock(), "relay/other": MagicMock()}
+
+        with self.persistence._get_repo_lock("relay/folder"):
+            self.persistence.shutdown(timeout=0.05)
+
+        assert os.path.exists(busy_lock)
+        assert not os.path.exists(idle_lock)
+
+    def test_signal_interrupts_and_leaves_cleanup_to_shutdown(self):
+        """Test the signal handler flags shutdown, interrupts, and does not clean locks itself"""
+        lock = self.touch(self.git_dir, "index.lock")
+        self.persistence.git_repos = {"relay/folder": MagicMock()}
+
+        with pytest.raises(SystemExit) as exc_info:
+            signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+        assert exc_info.value.code == 128 + signal.SIGTERM
+        with pytest.raises(KeyboardInterrupt):
+            signal.getsignal(signal.SIGINT)(signal.SIGINT, None)
+
+        assert self.persistence.shutdown_requested
+        assert os.path.exists(lock)
+
+        self.persistence.shutdown(timeout=0)
+        assert not os.path.exists(lock)
+
+    def test_no_new_commits_after_shutdown(self):
+        """Test the commit cycle stops starting repositories once shutdown begins"""
+        mock_repo = MagicMock()
+        mock_repo.git.status.return_value = "?? new.md"
+        self.persistence.git_repos = {"relay/folder": mock_repo}
+
+        self.persistence.shutdown(timeout=0)
+
+        assert self.persistence.commit_changes() is False
+        mock_repo.index.commit.assert_not_called()
+
 
 @patch("git.Repo")
 class TestGitOperations:
@@ -496,6 +728,16 @@ class TestGitOperations:
     def teardown_method(self):
         shutil.rmtree(self.temp_dir)
 
+    def test_preparsed_git_config_is_reused(self, mock_git_repo):
+        """Test a caller-supplied connector config is used without reparsing"""
+        git_config = MagicMock()
+
+        with patch("persistence.GitConnectorConfig") as mock_config_cls:
+            persistence = PersistenceManager(self.temp_dir, git_config=git_config)
+
+        assert persistence.git_config is git_config
+        mock_config_cls.assert_not_called()
+
     def test_init_git_repo_creates_new_repo(self, mock_git_repo):
         """Test initializing new git repository"""
         # Mock git.Repo to raise InvalidGitRepositoryError first (no existing repo)
@@ -520,6 +762,18 @@ class TestGitOperations:
         mock_git_repo.assert_called_with(expected_path)
         assert repo == mock_repo
 
+    def test_git_env_applied_per_repo(self, mock_git_repo):
+        """Test SSH settings are attached to the repository instead of os.environ"""
+        mock_repo = MagicMock()
+        mock_git_repo.return_value = mock_repo
+        self.persistence._git_env = {"GIT_SSH_COMMAND": "ssh -i /tmp/key"}
+        environ_before = dict(os.environ)
+
+        self.persistence.init_git_repo(self.relay_id, self.folder_id)
+
+        mock_repo.git.update_environment.assert_called_once_with(GIT_SSH_COMMAND="ssh -i /tmp/key")
+        assert dict(os.environ) == environ_before
+
     @patch("os.path.exists")
     def test_commit_changes_with_dirty_repo(self, mock_exists, mock_git_repo):
         """Test committing changes when repository is dirty"""
@@ -527,15 +781,16 @@ class TestGitOperations:
 
         # Setup mock repo
         mock_repo = MagicMock()
-        mock_repo.is_dirty.return_value = True
-        mock_repo.untracked_files = ["new_file.txt"]
+        mock_repo.git.status.return_value = "?? new_file.txt"
 
         self.persistence.git_repos[f"{self.relay_id}/{self.folder_id}"] = mock_repo
 
         result = self.persistence.commit_changes()
 
         # Check git operations were called
-        mock_repo.git.add.assert_called_once_with(A=True)
+        mock_repo.git.add.assert_called_once_with(
+            "-A", "--", "new_file.txt", env={"GIT_LITERAL_PATHSPECS": "1"}
+        )
         mock_repo.index.commit.assert_called_once()
         assert result is True
 
@@ -546,18 +801,136 @@ class TestGitOperations:
 
         # Setup clean mock repo
         mock_repo = MagicMock()
-        mock_repo.is_dirty.return_value = False
-        mock_repo.untracked_files = []
+        mock_repo.git.status.return_value = ""
 
         self.persistence.git_repos[f"{self.relay_id}/{self.folder_id}"] = mock_repo
 
         result = self.persistence.commit_changes()
 
+        # The status probe must not take index.lock
+        assert mock_repo.git.status.call_args.kwargs["env"] == {"GIT_OPTIONAL_LOCKS": "0"}
+
         # Check no git operations were called
         mock_repo.git.add.assert_not_called()
         mock_repo.index.commit.assert_not_called()
         assert result is False
 
+    def test_commit_stages_reported_paths(self, mock_git_repo):
+        """Test staging uses status output, skipping already-staged entries"""
+        mock_repo = MagicMock()
+        mock_repo.remotes = []
+        mock_repo.git.status.return_value = "\0".join(
+            [" M notes/a b.md", "?? new.md", " D gone.md", "R  moved.md", "old.md", "A  staged.md"]
+        )
+        self.persistence.git_repos[f"{self.relay_id}/{self.folder_id}"] = mock_repo
+
+        assert self.persistence.commit_changes() is True
+
+        mock_repo.git.add.assert_called_once_with(
+            "-A", "--", "notes/a b.md", "new.md", "gone.md", env={"GIT_LITERAL_PATHSPECS": "1"}
+        )
+        mock_repo.index.commit.assert_called_once()
+
+    @patch("persistence.PATHSPEC_CHUNK_SIZE", 2)
+    def test_commit_stages_paths_in_chunks(self, mock_git_repo):
+        """Test a long list of changed paths is staged over several git add calls"""
+        mock_repo = MagicMock()
+        mock_repo.remotes = []
+        mock_repo.git.status.return_value = "\0".join(["?? a.md", "?? b.md", "?? c.md"])
+        self.persistence.git_repos[f"{self.relay_id}/{self.folder_id}"] = mock_repo
+
+        assert self.persistence.commit_changes() is True
+
+        staged = [call.args[2:] for call in mock_repo.git.add.call_args_list]
+        assert staged == [("a.md", "b.md"), ("c.md",)]
+        mock_repo.index.commit.assert_called_once()
+
+    def test_default_remote_prefers_origin(self, mock_git_repo):
+        """Test origin is chosen when present, otherwise the first remote"""
+        upstream, origin = MagicMock(), MagicMock()
+        upstream.name, origin.name = "upstream", "origin"
+        mock_repo = MagicMock()
+
+        mock_repo.remotes = [upstream, origin]
+        assert self.persistence._default_remote(mock_repo) is origin
+
+        mock_repo.remotes = [upstream]
+        assert self.persistence._default_remote(mock_repo) is upstream
+
+        mock_repo.remotes = []
+        assert self.persistence._default_remote(mock_repo) is None
+
+    def test_commit_cycle_reads_remotes_once(self, mock_git_repo):
+        """Test one commit cycle resolves the remote once for both pull and push"""
+        origin = MagicMock()
+        origin.name = "origin"
+        mock_repo = MagicMock()
+        remotes = PropertyMock(return_value=[origin])
+        type(mock_repo).remotes = remotes
+        mock_repo.git.status.return_value = "?? new.md"
+        self.persistence.git_repos = {"relay/folder": mock_repo}
+
+        with (
+            patch.object(self.persistence, "_pull_from_remote") as pull,
+            patch.object(self.persistence, "_push_to_remote") as push,
+        ):
+            assert self.persistence.commit_changes() is True
+
+        remotes.assert_called_once()
+        pull.assert_called_once_with("relay/folder", mock_repo, origin)
+        push.assert_called_once_with("relay/folder", mock_repo, origin)
+
+    def test_repo_locks_are_per_repository(self, mock_git_repo):
+        """Test git operations on one repository do not block another"""
+        assert self.persistence._get_repo_lock("r/a") is self.persistence._get_repo_lock("r/a")
+        assert self.persistence._get_repo_lock("r/a") is not self.persistence._get_repo_lock("r/b")
+
+        with self.persistence._get_repo_lock("r/a"):
+            # Would deadlock under a single process-wide lock
+            assert self.persistence._safe_git_operation(lambda: "done", repo_key="r/b") == "done"
+
+    def test_commit_failure_does_not_block_other_repos(self, mock_git_repo):
+        """Test a failing repository is logged while the others still commit"""
+        failing_repo = MagicMock()
+        failing_repo.git.status.side_effect = git.exc.GitCommandError(["git", "status"], 128)
+        dirty_repo = MagicMock()
+        dirty_repo.git.status.return_value = " M note.md"
+        dirty_repo.remotes = []
+
+        self.persistence.git_repos = {"relay/a": failing_repo, "relay/b": dirty_repo}
+
+        assert self.persistence.commit_changes() is True
+        dirty_repo.index.commit.assert_called_once()
+
+
+class TestCommitRealRepository:
+    """Test the commit cycle against a real git repository"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.persistence = PersistenceManager(self.temp_dir)
+        self.repo_path = os.path.join(self.temp_dir, "work")
+        self.repo = git.Repo.init(self.repo_path)
+        self.repo.git.config("user.email", "test@example.com")
+        self.repo.git.config("user.name", "test")
+        self.persistence.git_repos["relay/folder"] = self.repo
+
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_commits_files_with_pathspec_characters(self):
+        """Test names git would read as globs or pathspec magic are staged literally"""
+        names = [":notes.md", "a[1].md", "*.md", "plain.md"]
+        for name in names:
+            with open(os.path.join(self.repo_path, name), "w") as f:
+                f.write(name)
+
+        assert self.persistence.commit_changes() is True
+
+        committed = self.repo.git.ls_tree("-r", "--name-only", "HEAD").splitlines()
+        assert sorted(committed) == sorted(names)
+        assert self.repo.git.status("--porcelain") == ""
+
 
 class TestSSHKeyManager:
     """Test SSH key management functionality"""
@@ -632,6 +1005,14 @@ class TestSSHKeyManager:
         assert public_key.startswith("ssh-rsa ")
         assert len(public_key.split()) >= 2  # ssh-rsa + key data
 
+    def test_get_public_key_served_from_memory(self):
+        """Test the public key is not re-read from disk after setup"""
+        ssh_manager = SSHKeyManager(self.temp_dir)
+        expected = ssh_manager.get_public_key()
+
+        with patch("builtins.open", side_effect=AssertionError("unexpected file read")):
+            assert ssh_manager.get_public_key() == expected
+
     def test_invalid_key_format_raises_error(self):
         """Test that invalid key format raises RuntimeError"""
         os.environ["SSH_PRIVATE_KEY"] = "not a valid key"
@@ -719,7 +1100,7 @@ class TestOutOfBandPushRecovery:
         self.mine.git.add(A=True)
         self.mine.index.commit("stale-parent commit")
 
-        self.pm._push_to_remote(self.repo_key, self.mine)
+        self.pm._push_to_remote(self.repo_key, self.mine, self.mine.remotes.origin)
 
         assert self._reached_remote(self.mine.head.commit.hexsha), (
             "rejected push was not recovered (rebase + re-push)"
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
 import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from y_sweet_sdk import YSweetError
 from relay_client import RelayClient
 
 
@@ -73,4 +76,59 @@ class TestRelayClientIdExtraction:
         
         with pytest.raises(ValueError) as exc_info:
             RelayClient.create_folder_resource_from_compound_id(compound_id)
-        assert "2 or 3 complete UUIDs" in str(exc_info.value)
\ No newline at end of file
+        assert "2 or 3 complete UUIDs" in str(exc_info.value)
+
+
+class TestSharedSession:
+    """Test that document fetches reuse the client's pooled HTTP session"""
+
+    def make_client(self, auth_response):
+        client = RelayClient("http://relay.example", "api-key")
+        client.session = MagicMock()
+        client.dm.session = client.session
+        update_response = MagicMock(content=b"update")
+
+        def request(method, url, **kwargs):
+            return auth_response if url.endswith("/auth") else update_response
+
+        client.session.request.side_effect = request
+        return client
+
+    def test_doc_fetch_uses_session(self):
+        """Test get_doc_as_update sends both requests through self.session"""
+        auth_response = MagicMock()
+        auth_response.json.return_value = {
+            "baseUrl": "http://relay.example/d/doc-1/",
+            "docId": "doc-1",
+            "token": "doc-token",
+        }
+        client = self.make_client(auth_response)
+
+        with patch("requests.request") as module_request:
+            assert client.get_doc_as_update("doc-1") == b"update"
+
+        module_request.assert_not_called()
+        auth_call, update_call = client.session.request.call_args_list
+        assert auth_call.args == ("POST", f"{client.dm.base_url}/doc/doc-1/auth")
+        assert auth_call.kwargs["headers"] == {"Authorization": "Bearer api-key"}
+        assert len(auth_call.kwargs["params"]["z"]) == 8
+        assert update_call.args == ("GET", "http://relay.example/d/doc-1/as-update")
+        assert update_call.kwargs["headers"] == {"Authorization": "Bearer doc-token"}
+
+    def test_http_errors_raise_ysweet_error(self):
+        """Test failed requests surface as the SDK's YSweetError"""
+        auth_response = MagicMock()
+        auth_response.raise_for_status.side_effect = requests.HTTPError(
+            response=MagicMock(status_code=401)
+        )
+        client = self.make_client(auth_response)
+
+        with pytest.raises(YSweetError) as exc_info:
+            client.get_doc_as_update("doc-1")
+        assert exc_info.value.cause == {"code": "InvalidAuthProvided"}
+
+    def test_document_manager_shares_client_session(self):
+        """Test the document manager is built on the same session as S3 downloads"""
+        client = RelayClient("http://relay.example")
+
+        assert client.dm.session is client.session
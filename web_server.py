@@ -15,7 +15,13 @@ import yaml
 
 from webhook_handler import WebhookProcessor
 from operations_queue import OperationsQueue
-from auth_middleware import AuthMiddleware, DefaultRejectMiddleware, noauth, webhook_auth
+from auth_middleware import (
+    AuthMiddleware,
+    default_reject_exception_handler,
+    noauth,
+    validate_route_auth,
+    webhook_auth,
+)
 from persistence import PersistenceManager, SSHKeyManager
 
 logger = logging.getLogger(__name__)
@@ -36,22 +42,30 @@ class StarletteWebServer:
         self.webhook_secret = webhook_secret
         self.persistence_manager = persistence_manager
 
-        # Create middleware with default reject pattern
+        routes = [
+            Route("/webhooks", self.handle_webhook, methods=["POST"]),
+            Route("/health", self.health_check, methods=["GET"]),
+            Route("/api/pubkey", self.get_pubkey, methods=["GET"]),
+            Route("/docs", self.api_docs, methods=["GET"]),
+            Route("/openapi.yaml", self.openapi_spec, methods=["GET"]),
+        ]
+
+        # Enforce the default reject pattern once at startup rather than per request
+        validate_route_auth(routes)
+
         middleware = [
             Middleware(AuthMiddleware, webhook_secret=webhook_secret),
-            Middleware(DefaultRejectMiddleware),
         ]
 
+        # Requests that match no route or method are rejected as unauthenticated, not 404/405
+        exception_handlers = {
+            404: default_reject_exception_handler,
+            405: default_reject_exception_handler,
+        }
+
         # Create Starlette app
         self.app = Starlette(
-            routes=[
-                Route("/webhooks", self.handle_webhook, methods=["POST"]),
-                Route("/health", self.health_check, methods=["GET"]),
-                Route("/api/pubkey", self.get_pubkey, methods=["GET"]),
-                Route("/docs", self.api_docs, methods=["GET"]),
-                Route("/openapi.yaml", self.openapi_spec, methods=["GET"]),
-            ],
-            middleware=middleware,
+            routes=routes, middleware=middleware, exception_handlers=exception_handlers
         )
 
     @webhook_auth
@@ -78,8 +92,9 @@ class StarletteWebServer:
                 logger.error("Failed to process webhook payload")
                 return JSONResponse({"error": "Invalid webhook payload"}, status_code=400)
 
-            # Queue the processed webhook data
-            self.operations_queue.enqueue_document_change(change_data)
+            # Queue the processed webhook data; ask the sender to retry if we're saturated
+            if not self.operations_queue.enqueue_document_change(change_data):
+                return JSONResponse({"error": "Operations queue full"}, status_code=503)
 
             return JSONResponse({"status": "received"})
 